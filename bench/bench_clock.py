@@ -0,0 +1,61 @@
+'''
+python bench/bench_clock.py times now() and replays a suspend and an ntp step against a timer on the wall clock
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from time import time
+from timeit import timeit
+
+from Clock import Clock
+
+runs = 100000
+clock = Clock()
+print "now()          %6.2f us" % (timeit(clock.now, number=runs) * 1e6 / runs)
+print "time()         %6.2f us" % (timeit(time, number=runs) * 1e6 / runs)
+
+class Fake(object):
+    '''
+    a machine's clocks, the wall one can be stepped and suspending stops the awake one
+    '''
+    def __init__(self):
+        self.elapsed = self.awake = 0.0
+        self.wall = 1358236800.0
+    def run(self, seconds):
+        self.elapsed += seconds
+        self.awake += seconds
+        self.wall += seconds
+    def suspend(self, seconds):
+        self.elapsed += seconds
+        self.wall += seconds
+
+interval = 1200
+def replay(event):
+    '''
+    seconds at the machine until a 20 minute interval runs out, timed on the wall clock and on ours
+    with the gap discarded
+    '''
+    machine = Fake()
+    clock = Clock(elapsed=lambda: machine.elapsed, awake=lambda: machine.awake, wall=lambda: machine.wall)
+    wall_since, since = machine.wall, clock.now()
+    wall_ran = ran = None
+    for second in range(4 * interval):
+        if second == 300:
+            event(machine)
+        machine.run(1)
+        since += clock.tick()
+        if wall_ran is None and machine.wall > wall_since + interval:
+            wall_ran = machine.awake
+        if ran is None and clock.now() > since + interval:
+            ran = machine.awake
+    return wall_ran, ran, clock.stats()
+
+print "interval of %s s, event 300 s in" % interval
+for name, event in (("ntp steps back 1 h", lambda m: setattr(m, 'wall', m.wall - 3600)),
+                    ("ntp steps ahead 1 h", lambda m: setattr(m, 'wall', m.wall + 3600)),
+                    ("suspended 2 h", lambda m: m.suspend(7200))):
+    wall_ran, ran, stats = replay(event)
+    print "%-20s wall clock ran out after %5s s, ours after %5s s, %s" % (
+        name, int(wall_ran) if wall_ran is not None else 'never', int(ran), stats)
@@ -0,0 +1,42 @@
+'''
+python bench/bench_decoder.py [projects] runs the benchmark of Decoder.decode and Decoder.decode_daily on a fake daily document
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from timeit import timeit
+
+from Decoder import decode, decode_daily, backend, task_fields, json
+
+def _fake_daily(projects = 4000, tasks = 12, entries = 8):
+    '''
+    a /daily document shaped like a big agency account
+    '''
+    return json.dumps({
+        'for_day': '2013-01-15',
+        'day_entries': [{
+            'id': 1000 + e, 'project_id': '%s' % e, 'task_id': '%s' % e, 'hours': 0.33, 'notes': 'note %s' % e,
+            'project': 'Project %s' % e, 'task': 'Task %s' % e, 'client': 'Client %s' % e,
+            'created_at': '2013-01-15T09:00:00Z', 'updated_at': '2013-01-15T10:00:00Z', 'timer_started_at': None,
+        } for e in range(entries)],
+        'projects': [{
+            'id': p, 'name': 'Project %s' % p, 'code': 'P%s' % p, 'billable': True, 'client': 'Client %s' % (p / 10),
+            'client_id': p / 10, 'client_currency': 'United States Dollar - USD', 'client_currency_symbol': '$',
+            'tasks': [{'id': t, 'name': 'Task %s' % t, 'billable': t % 2 == 0} for t in range(tasks)],
+        } for p in range(projects)],
+    })
+
+projects = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+raw = _fake_daily(projects)
+runs = 5
+
+assert [p['tasks'] for p in decode_daily(raw)['projects']] == \
+       [[dict((k, t[k]) for k in task_fields) for t in p['tasks']] for p in decode(raw)['projects']]
+
+print "%s projects, %0.1f KB" % (projects, len(raw) / 1024.0)
+print "decode (%s): %0.1f ms" % (backend, timeit(lambda: decode(raw), number=runs) * 1000 / runs)
+if backend != json.__name__:
+    print "decode (%s): %0.1f ms" % (json.__name__, timeit(lambda: json.loads(raw), number=runs) * 1000 / runs)
+print "decode_daily (%s walker): %0.1f ms" % (json.__name__, timeit(lambda: decode_daily(raw), number=runs) * 1000 / runs)
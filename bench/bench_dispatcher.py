@@ -0,0 +1,52 @@
+'''
+python bench/bench_dispatcher.py [seconds] shows how long the main loop is held by a harvest call that takes that long
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from Queue import Queue, Empty
+from time import time, sleep
+
+from Dispatcher import Dispatcher
+
+hiccup = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+loop = Queue() #stands in for the gtk main loop
+
+def slow_call():
+    sleep(hiccup)
+    return {'day_entries': []}
+
+def longest_hold(work):
+    '''
+    longest stretch the main loop could not repaint while work runs, with a 10 ms tick as the frame clock
+    '''
+    longest = 0
+    last = time()
+    work()
+    end = time() + 2 * hiccup + 0.5
+    while time() < end:
+        try:
+            fn, args = loop.get(timeout=0.01)
+            fn(*args)
+        except Empty:
+            pass
+        now = time()
+        longest = max(longest, now - last)
+        last = now
+    return longest
+
+dispatcher = Dispatcher(lambda fn, *args: loop.put((fn, args)))
+results = []
+def dispatched():
+    for n in range(2): #two submits of the same entry, the second waits for the first
+        dispatcher.run(slow_call, done=results.append, key='entry')
+
+print "harvest call taking %0.1f s" % hiccup
+print "on the main loop  held %8.1f ms" % (longest_hold(slow_call) * 1000)
+held = longest_hold(dispatched)
+print "dispatched        held %8.1f ms, %s of 2 answers back" % (held * 1000, len(results))
+print dispatcher.stats()
+dispatcher.close()
+sleep(0.1) #let the workers see the shutdown before the interpreter goes
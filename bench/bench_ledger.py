@@ -0,0 +1,32 @@
+'''
+python bench/bench_ledger.py [switches] compares the hours a day of task switches sends with the ledger and rounding each change
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from random import Random
+
+from Ledger import Ledger
+
+switches = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+interval = int(round(3600 * 0.33)) #seconds, the default interval of 0.33 hours
+random = Random(42)
+
+ledger = Ledger()
+worked = {}
+for n in range(switches): #a day of task switches, each one started with an interval and stopped early
+    entry = str(n % 5)
+    elapsed = random.randint(60, interval)
+    worked[entry] = worked.get(entry, 0) + elapsed
+    ledger.add(entry, interval)
+    ledger.add(entry, elapsed - interval)
+
+exact = sum(worked.values()) / 3600.0
+naive = sum(ledger._naive.values())
+sent = sum(ledger.hours(entry) for entry in worked)
+print "%s switches over %s entries" % (switches, len(worked))
+print "worked        %6.3f hours" % exact
+print "rounded each  %6.3f hours, %+5.0f seconds off" % (naive, (naive - exact) * 3600)
+print "ledger        %6.3f hours, %+5.0f seconds off" % (sent, (sent - exact) * 3600)
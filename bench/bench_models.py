@@ -0,0 +1,44 @@
+'''
+python bench/bench_models.py [projects] compares the memory of a catalog held as dicts and as models
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+import json
+
+from Models import Project
+
+def _deep_size(value, seen = None):
+    '''
+    bytes held by value and everything it refers to, each object counted once
+    '''
+    seen = seen if seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(v, seen) for v in value)
+    elif hasattr(value, '__slots__'):
+        size += sum(_deep_size(getattr(value, slot), seen) for slot in value.__slots__ if hasattr(value, slot))
+    return size
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+#decoded from json like harvest's answer, so strings are not shared between projects
+projects = json.loads(json.dumps([{
+    'id': p, 'name': 'Project %s' % p, 'client': 'Client %s' % (p / 10),
+    'tasks': [{'id': t, 'name': 'Task %s' % t} for t in range(1, 11)],
+} for p in range(1, count + 1)]))
+
+#what a session kept before, the store's copy of the catalog plus label dicts for the comboboxes
+labels = dict((str(p['id']), "%s - %s" % (p['client'], p['name'])) for p in projects)
+tasks = dict((str(p['id']), dict((str(t['id']), "%s" % t['name']) for t in p['tasks'])) for p in projects)
+before = _deep_size([projects, labels, tasks])
+after = _deep_size(Project.catalog(projects))
+print "%s projects, %s tasks" % (count, count * 10)
+print "dicts  %8.1f KB" % (before / 1024.0)
+print "models %8.1f KB, %0.0f%% less" % (after / 1024.0, 100 - after * 100.0 / before)
@@ -0,0 +1,34 @@
+'''
+python bench/bench_notes.py [lines] times reading the timeline of notes that grow by a line at a time
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from timeit import timeit
+
+from Notes import Timelines, Timeline, STOPPED, SWITCH_TO
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+lines = ["%02d:%02d:%02d: line %s%s" % (n / 3600 % 24, n / 60 % 60, n % 60, n,
+                                        " #TimerStarted" if n % 50 == 0 else "") for n in range(count)]
+notes = "\n".join(lines)
+
+def before():
+    last_line = notes.split("\n")[-1]
+    return last_line.split(" ")[-1] == STOPPED or last_line.find(SWITCH_TO) > -1
+
+timelines = Timelines()
+timelines.get(1, notes)
+grown = [notes]
+def appended():
+    grown[0] += "\n12:00:00: one more"
+    return timelines.get(1, grown[0]).stopped
+
+runs = 200
+print "%s lines of notes" % count
+print "full parse       %8.3f ms" % (timeit(lambda: Timeline(notes), number=20) * 1000 / 20)
+print "split last line  %8.3f ms" % (timeit(before, number=runs) * 1000 / runs)
+print "one line added   %8.3f ms" % (timeit(appended, number=runs) * 1000 / runs)
+print "unchanged        %8.3f ms" % (timeit(lambda: timelines.get(1, grown[0]).stopped, number=runs) * 1000 / runs)
@@ -0,0 +1,33 @@
+'''
+python bench/bench_store.py [entries] times searches over a store of fake entries
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from random import Random
+from timeit import timeit
+from datetime import date, timedelta
+
+from Store import Store
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+random = Random(42)
+words = ["review", "deploy", "meeting", "fix", "refactor", "tests", "release", "support", "docs", "planning"]
+store = Store()
+first = date(2009, 1, 1)
+per_day = 10
+for offset in range(count / per_day):
+    day = (first + timedelta(days=offset)).isoformat()
+    store.sync_day({'for_day': day, 'day_entries': [{
+        'id': offset * per_day + e, 'project_id': random.randint(1, 40), 'task_id': random.randint(1, 12),
+        'hours': 0.5, 'notes': "\n".join("%s JIRA-%s commit %x" % (random.choice(words), random.randint(1, 9999),
+                                          random.getrandbits(28)) for line in range(3)),
+    } for e in range(per_day)]})
+
+runs = 20
+print "%s entries over %s days" % (count, count / per_day)
+for query in ("JIRA-1234", "JIRA-12*", "deploy fix", "dep*", "nothing"):
+    found = len(store.search(query))
+    print "%-10s %3s found, %0.2f ms" % (query, found, timeit(lambda: store.search(query), number=runs) * 1000 / runs)
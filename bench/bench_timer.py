@@ -0,0 +1,33 @@
+'''
+python bench/bench_timer.py [events] times replaying a journal of that many events
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+import json
+import tempfile
+from timeit import timeit
+
+from Timer import Timer
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+path = os.path.join(tempfile.mkdtemp(), "timer.journal")
+Timer.compact_after = count * 2 #time the replay, not the compaction
+with open(path, 'w') as journal:
+    at = 1358236800
+    for seq in range(count):
+        name = ('start', 'away', 'extend', 'back', 'expire', 'confirm', 'stop')[seq % 7]
+        event = {'seq': seq, 'event': name, 'at': at + seq * 60}
+        if name == 'start':
+            event.update(entry_id=str(seq), project_id='1', task_id='7')
+        journal.write("%s\n" % json.dumps(event))
+
+timer = Timer(path)
+print "%s events replayed to %s" % (count, timer.state)
+print "replay  %8.2f ms" % (timeit(lambda: Timer(path), number=3) * 1000 / 3)
+Timer.compact_after = 0
+Timer(path)
+print "compacted to %s bytes, replay %8.3f ms" % (os.path.getsize(path), timeit(lambda: Timer(path), number=3) * 1000 / 3)
+assert Timer(path).state == timer.state and Timer(path).entry_id == timer.entry_id
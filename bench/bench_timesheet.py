@@ -0,0 +1,36 @@
+'''
+python bench/bench_timesheet.py [projects] opens a week twice against the stand in and prints what each transferred
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+sys.path.insert( 1, '%s/../tests' % (bench_path) )
+
+from time import time
+from datetime import date, timedelta
+
+from Harvest import Harvest
+from Store import Store
+from Timesheet import Timesheet
+from HarvestStandIn import HarvestStandIn
+
+server = HarvestStandIn(projects=int(sys.argv[1]) if len(sys.argv) > 1 else 400)
+server.start()
+today = date.today()
+for offset in range(today.weekday() + 1):
+    server.add(offset % 5 + 1, 1, "day %s" % offset, 1.5, (today - timedelta(days=offset)).isoformat())
+
+harvest = Harvest(server.uri, "user@example.com", "password", fresh_for=0)
+timesheet = Timesheet(harvest, Store())
+
+for run in ("cold", "warm"):
+    server.reset_stats()
+    started = time()
+    week = timesheet.refresh().result(30)
+    print "%s open: %s requests, %s bytes, %0.1f ms" % (run, server.stats()['requests'],
+                                                       server.stats()['bytes_sent'], (time() - started) * 1000)
+for project, task, hours, total in timesheet.rows(week):
+    print "%-22s %-8s %s %5.2f" % (project, task, " ".join("%4.1f" % h for h in hours), total)
+harvest.close()
+server.stop()
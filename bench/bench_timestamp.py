@@ -0,0 +1,46 @@
+'''
+python bench/bench_timestamp.py [entries] times Timestamp.parse and Timestamp.epoch against dateutil
+'''
+
+import os, sys
+bench_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (bench_path) )
+
+from time import mktime
+from timeit import timeit
+from calendar import timegm
+from datetime import datetime, timedelta
+
+from dateutil.parser import parse as _parse
+
+from Timestamp import parse, epoch, _cache
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+first = datetime(2013, 1, 15, 8)
+raws = [(first + timedelta(seconds=37 * n)).strftime("%Y-%m-%dT%H:%M:%SZ") for n in range(count)]
+
+for raw in raws[:100]:
+    assert parse(raw) == _parse(raw)
+    assert epoch(raw) == timegm(_parse(raw).utctimetuple())
+
+def before():
+    for raw in raws: #updated_at and created_at of every entry, as _setup_current_data did
+        mktime(_parse(raw).timetuple())
+        _parse(raw)
+
+def cold():
+    _cache.clear()
+    for raw in raws:
+        epoch(raw)
+        parse(raw)
+
+def warm():
+    for raw in raws:
+        epoch(raw)
+        parse(raw)
+
+print "%s entries" % count
+print "dateutil %8.2f ms" % (timeit(before, number=1) * 1000)
+print "cold     %8.2f ms" % (timeit(cold, number=3) * 1000 / 3)
+cold()
+print "warm     %8.2f ms" % (timeit(warm, number=3) * 1000 / 3)
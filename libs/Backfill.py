@@ -0,0 +1,187 @@
+'''
+fetch a range of days from harvest into a json lines file, a few days at a time
+
+>>> import Backfill
+>>> client = Harvest.AsyncHarvest("https://COMPANYNAME.harvestapp.com", "EMAIL", "PASSWORD", workers=8)
+>>> backfill = Backfill.Backfill(client, "history-2013.jsonl")
+>>> backfill.run("2013-01-01", "2013-12-31") #days already in the file are skipped, so rerun after a failure
+{'days': 365, 'fetched': 365, 'skipped': 0, 'failed': 0, 'entries': 2911, 'bytes': 812345, 'seconds': 61.2, 'days_per_second': 5.96}
+
+every line is {"day": "2013-01-15", "day_entries": [...]}, read it back with
+>>> for day, entries in Backfill.read("history-2013.jsonl"): ...
+
+bin/timetracker-backfill runs it from the command line
+'''
+
+import os
+import json
+from datetime import date, timedelta
+from time import time
+from Queue import Queue
+
+from Harvest import HarvestError
+from Store import StoreError
+from Timestamp import day as _day
+
+class Backfill(object):
+    def __init__(self, client, path, window = 8, params = None, store = None):
+        '''
+        client - AsyncHarvest, its rate limiter keeps us within harvest's request limit
+        window - days in flight at once, more than the client has workers only queues them
+        params - extra query parameters for every day, eg. {'of_user': 42} for admins. slim=1 is always sent,
+                 the project catalog is the same every day and most of the payload
+        store - Store to also sync every day into
+        '''
+        self.client = client
+        self.path = path
+        self.window = window
+        self.params = dict(params or {}, slim=1)
+        self.store = store
+        self.errors = {} #iso day -> HarvestError or StoreError of the last run
+
+    def done(self):
+        '''
+        iso days already in the file
+        '''
+        return set(day for day, entries in read(self.path))
+
+    def run(self, start, end, progress = None):
+        '''
+        fetch start to end, both iso dates or dates and included, returns the throughput report
+        progress - called with the report after every day
+        '''
+        days = list(_days(start, end))
+        done = self.done()
+        todo = [day for day in days if day.isoformat() not in done]
+
+        report = {'days': len(days), 'fetched': 0, 'skipped': len(days) - len(todo), 'failed': 0, 'entries': 0,
+                  'bytes': 0, 'seconds': 0, 'days_per_second': 0}
+        self.errors = {}
+
+        results = Queue()
+        started = time()
+        out = self._open()
+        try:
+            todo = iter(todo)
+            in_flight = 0
+            for day in todo:
+                self._fetch(day, results)
+                in_flight += 1
+                if in_flight >= self.window:
+                    break
+
+            while in_flight:
+                day, future = results.get()
+                in_flight -= 1
+                try:
+                    self._save(out, day, future.result(), report)
+                except (HarvestError, StoreError) as e: #left out of the file, the next run tries it again
+                    self.errors[day.isoformat()] = e
+                    report['failed'] += 1
+
+                for day in todo: #keep the window full
+                    self._fetch(day, results)
+                    in_flight += 1
+                    break
+
+                report['seconds'] = round(time() - started, 1)
+                report['days_per_second'] = round(report['fetched'] / max(time() - started, 0.001), 2)
+                if progress:
+                    progress(report)
+        finally:
+            out.close()
+        return report
+
+    def _fetch(self, day, results):
+        future = self.client.get_day(day.timetuple().tm_yday, day.year, params=self.params, cache=False)
+        future.add_done_callback(lambda f: results.put((day, f)))
+
+    def _save(self, out, day, data, report):
+        entries = data.get('day_entries', [])
+        if self.store: #first, a day in the file is done and would never be synced again
+            self.store.sync_day({'for_day': day.isoformat(), 'day_entries': entries}, day.isoformat())
+        line = json.dumps({'day': day.isoformat(), 'day_entries': entries}, separators=(',', ':')) + "\n"
+        out.write(line)
+        out.flush()
+        report['fetched'] += 1
+        report['entries'] += len(entries)
+        report['bytes'] += len(line)
+
+    def _open(self):
+        '''
+        open for appending, cutting off a line left half written by an interrupted run
+        '''
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                while end: #back to just past the last newline
+                    start = max(end - 4096, 0)
+                    f.seek(start)
+                    cut = f.read(end - start).rfind("\n")
+                    if cut >= 0:
+                        end = start + cut + 1
+                        break
+                    end = start
+                f.truncate(end)
+        return open(self.path, 'ab')
+
+def read(path):
+    '''
+    yields (iso day, day_entries) from a backfill file, a half written last line is ignored
+    '''
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith("\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            yield record['day'], record['day_entries']
+
+def _days(start, end):
+    start, end = _day(start), _day(end)
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+def main(argv = None):
+    import argparse
+    from getpass import getpass
+
+    from Harvest import AsyncHarvest
+    from Store import Store
+
+    year = date.today().year
+    parser = argparse.ArgumentParser(description="Fetch a range of days from Harvest into a json lines file")
+    parser.add_argument("uri", help="https://COMPANYNAME.harvestapp.com")
+    parser.add_argument("email")
+    parser.add_argument("output", help="file to append days to, days already in it are skipped")
+    parser.add_argument("--start", default="%s-01-01" % year, help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", default=date.today().isoformat(), help="last day, YYYY-MM-DD")
+    parser.add_argument("--of-user", type=int, help="user id to fetch for, needs an admin account")
+    parser.add_argument("--workers", type=int, default=8, help="days fetched at once")
+    parser.add_argument("--store", help="sqlite store to also sync the days into")
+    args = parser.parse_args(argv)
+
+    password = os.environ.get('HARVEST_PASSWORD') or getpass("Harvest password for %s: " % args.email)
+    client = AsyncHarvest(args.uri, args.email, password, workers=args.workers)
+    backfill = Backfill(client, args.output, window=args.workers,
+                        params={'of_user': args.of_user} if args.of_user else None,
+                        store=Store(args.store) if args.store else None)
+
+    def progress(report):
+        print "\r%(fetched)s/%(days)s days, %(failed)s failed, %(days_per_second)s days/s" % report,
+
+    try:
+        report = backfill.run(args.start, args.end, progress)
+    finally:
+        client.close()
+    print
+    print "%(fetched)s days fetched, %(skipped)s already there, %(failed)s failed, %(entries)s entries, " \
+          "%(bytes)s bytes in %(seconds)ss, %(days_per_second)s days/s" % report
+    for day, error in sorted(backfill.errors.items()):
+        print "%s: %s" % (day, error)
+    return 1 if report['failed'] else 0
@@ -0,0 +1,161 @@
+'''
+the clock timing is done on, elapsed time comes from a clock that never steps and harvest's time is
+estimated from the Date of its answers
+
+the wall clock steps when ntp corrects it or the user changes it, and suspending the machine stops the
+main loop without anything noticing. intervals timed on it silently ran out or went on for hours
+
+>>> import Clock
+>>> clock = Clock.Clock(policy=Clock.AWAY) #time the machine slept counts as away from desk
+>>> clock.now() #seconds since the epoch, only ever moves forward at the rate of a real second
+1358244123.52
+>>> clock.observe(server, sent, received) #Date of an answer and our now() around its request
+>>> clock.server_time() #now on harvest's clock, compare with updated_at
+1358244125.02
+>>> clock.local(entry.updated_time) #harvest's timestamp on our clock
+1358244040.5
+>>> clock.tick() #once a second from the main loop, seconds it stood still when the machine slept
+0
+'''
+
+import os
+import ctypes
+import ctypes.util
+from time import time
+from threading import Lock
+
+PROMPT = 'prompt' #ask whether the user is still working on it
+AWAY = 'away' #count it as away from desk, the time goes on the entry
+DISCARD = 'discard' #the interval picks up where it stood before the gap
+
+POLICIES = (PROMPT, AWAY, DISCARD)
+
+_MONOTONIC = 1 #stops while suspended
+_BOOTTIME = 7 #linux, goes on while suspended
+
+class _timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+def _posix_clock(clock_id):
+    '''
+    clock_gettime(clock_id) as a function returning seconds, None when the system has no such clock
+    '''
+    for name in (ctypes.util.find_library('c'), ctypes.util.find_library('rt')):
+        try:
+            clock_gettime = ctypes.CDLL(name, use_errno=True).clock_gettime
+        except (OSError, AttributeError, TypeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+        spec = _timespec()
+        if clock_gettime(clock_id, ctypes.byref(spec)) != 0:
+            return None
+
+        def read():
+            clock_gettime(clock_id, ctypes.byref(spec))
+            return spec.tv_sec + spec.tv_nsec * 1e-9
+        return read
+    return None
+
+def _clocks():
+    '''
+    (elapsed, awake), elapsed counts suspended time and awake does not. both are the wall clock where
+    the system has neither, eg. windows, a step of it then shows up as a gap
+    '''
+    if os.name != 'posix':
+        return time, time
+    awake = _posix_clock(_MONOTONIC)
+    elapsed = _posix_clock(_BOOTTIME) or awake
+    if not awake:
+        return time, time
+    return elapsed, awake
+
+class Clock(object):
+    resume_gap = 30 #seconds asleep between two ticks before it counts as a gap, ticks come every second
+    step = 2 #seconds the wall clock has to move away from ours before it counts as stepped
+    samples = 8 #answers the server offset is estimated from
+
+    def __init__(self, policy = PROMPT, elapsed = None, awake = None, wall = time):
+        '''
+        policy - what a gap counts as, PROMPT, AWAY or DISCARD
+        elapsed, awake, wall - clocks returning seconds, the system's when not given
+        '''
+        self.policy = policy if policy in POLICIES else PROMPT
+        if elapsed is None:
+            elapsed, awake = _clocks()
+        self._elapsed = elapsed
+        self._awake = awake or elapsed
+        self.tells_suspend = self._awake is not self._elapsed #otherwise any long stall of the loop is a gap
+        self._wall = wall
+        self._epoch = wall() - elapsed() #the wall clock at start, now() is never set again after it
+
+        self._samples = [] #(round trip, offset) of the last answers
+        self._offset = 0.0 #seconds harvest's clock is ahead of ours
+        self._lock = Lock()
+        self._last_tick = None #(elapsed, awake, wall) of the last tick
+
+        self.gaps = 0 #ticks that came after a gap
+        self.gap_seconds = 0
+        self.stalled = 0 #seconds the main loop stood still while awake, real time at the desk, not gaps
+        self.stepped = 0 #seconds the wall clock was stepped by, ignored
+
+    def now(self):
+        '''
+        seconds since the epoch as the wall clock had them at start, never stepped
+        '''
+        return self._epoch + self._elapsed()
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def server_time(self):
+        '''
+        now on harvest's clock, as far as its answers told us
+        '''
+        return self.now() + self._offset
+
+    def local(self, server_time):
+        '''
+        a harvest timestamp on our clock
+        '''
+        return server_time - self._offset
+
+    def observe(self, server, sent, received):
+        '''
+        server - the Date of an answer, seconds since the epoch
+        sent, received - now() when the request went out and its answer came back.
+        Date only has whole seconds, the answer with the shortest round trip is trusted the most
+        '''
+        round_trip = max(received - sent, 0)
+        offset = server + 0.5 - (sent + received) / 2.0
+        with self._lock:
+            self._samples = self._samples[-(self.samples - 1):] + [(round_trip, offset)]
+            self._offset = min(self._samples)[1]
+
+    def tick(self):
+        '''
+        call once a second from the main loop, returns the seconds the machine slept since the last tick when
+        that is over resume_gap, 0 otherwise. a loop that stood still while awake is not a gap, the user was
+        there. where the system cant tell the two apart any stall over resume_gap is taken for a gap
+        '''
+        now = (self._elapsed(), self._awake(), self._wall())
+        last, self._last_tick = self._last_tick, now
+        if last is None:
+            return 0
+
+        elapsed, awake, wall = [a - b for a, b in zip(now, last)]
+        if abs(wall - elapsed) > self.step and self._elapsed is not self._wall:
+            self.stepped += abs(wall - elapsed)
+        asleep = max(elapsed - awake, 0) if self.tells_suspend else elapsed
+        if self.tells_suspend and awake > self.resume_gap:
+            self.stalled += awake
+        if asleep <= self.resume_gap:
+            return 0
+        self.gaps += 1
+        self.gap_seconds += asleep
+        return asleep
+
+    def stats(self):
+        return {'policy': self.policy, 'offset': round(self._offset, 1), 'gaps': self.gaps,
+                'gap_seconds': int(self.gap_seconds), 'stalled': int(self.stalled),
+                'stepped': int(self.stepped)}
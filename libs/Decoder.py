@@ -0,0 +1,143 @@
+'''
+json decoding for harvest answers
+
+>>> import Decoder
+>>> Decoder.backend
+'ujson'
+>>> Decoder.decode('{"day_entries": []}') #whole document, with the fastest json library installed
+{u'day_entries': []}
+>>> Decoder.decode_daily(raw) #only day_entries and the project/task catalog, one project at a time
+'''
+
+import re
+
+try:
+    import ujson as _fast
+except ImportError:
+    _fast = None
+
+try:
+    import simplejson as json #speedups are compiled into simplejson, and it has raw_decode like json
+except ImportError:
+    import json
+
+if _fast:
+    backend = 'ujson'
+    _loads = _fast.loads
+else:
+    backend = json.__name__
+    _loads = json.loads
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+#project and task fields the catalog keeps, everything else is skipped
+project_fields = ('id', 'name', 'client')
+task_fields = ('id', 'name')
+
+class DecodeError(ValueError):
+    pass
+
+def decode(raw):
+    '''
+    decode a whole json document
+    '''
+    try:
+        return _loads(raw)
+    except ValueError as e:
+        raise DecodeError(e)
+
+def decode_daily(raw):
+    '''
+    decode a /daily document keeping day_entries and top level values as they are, while projects are
+    walked one at a time into {'id', 'name', 'client', 'tasks': [{'id', 'name'}]} instead of building
+    the full tree of every project and task field first
+    '''
+    if isinstance(raw, str):
+        raw = raw.decode('utf-8')
+
+    try:
+        return _object(raw, _skip(raw, 0), {'projects': _projects})[0]
+    except (ValueError, IndexError) as e:
+        raise DecodeError(e)
+
+def decode_entries(raw):
+    '''
+    decode a /people/ID/entries list, unwrapping every {"day_entry": {..}}
+    '''
+    return [item.get('day_entry', item) for item in decode(raw)]
+
+def _skip(raw, idx):
+    return _whitespace.match(raw, idx).end()
+
+def _members(raw, idx):
+    '''
+    yields (key, index of its value) for the object starting at idx,
+    the caller sends back the index where it finished reading that value, see _object
+    '''
+    if raw[idx] != '{':
+        raise DecodeError("Expected an object at %s" % idx)
+    idx = _skip(raw, idx + 1)
+    if raw[idx] == '}':
+        return
+    while True:
+        key, idx = _decoder.raw_decode(raw, idx)
+        idx = _skip(raw, idx)
+        if raw[idx] != ':':
+            raise DecodeError("Expected ':' at %s" % idx)
+        end = yield key, _skip(raw, idx + 1)
+        idx = _skip(raw, end)
+        if raw[idx] == '}':
+            return
+        if raw[idx] != ',':
+            raise DecodeError("Expected ',' or '}' at %s" % idx)
+        idx = _skip(raw, idx + 1)
+
+def _object(raw, idx, nested):
+    '''
+    decode the object at idx, nested maps a key to the function decoding its value
+    '''
+    obj = {}
+    members = _members(raw, idx)
+    end = idx + 1 #past the { when the object is empty
+    try:
+        key, idx = members.next()
+        while True:
+            if key in nested:
+                obj[key], end = nested[key](raw, idx)
+            else:
+                obj[key], end = _decoder.raw_decode(raw, idx)
+            key, idx = members.send(end)
+    except StopIteration:
+        pass
+    return obj, _skip(raw, end) + 1 #past the }, whitespace may come before it
+
+def _array(raw, idx, item):
+    if raw[idx] != '[':
+        raise DecodeError("Expected an array at %s" % idx)
+    items = []
+    idx = _skip(raw, idx + 1)
+    if raw[idx] == ']':
+        return items, idx + 1
+    while True:
+        value, idx = item(raw, idx)
+        items.append(value)
+        idx = _skip(raw, idx)
+        if raw[idx] == ']':
+            return items, idx + 1
+        if raw[idx] != ',':
+            raise DecodeError("Expected ',' or ']' at %s" % idx)
+        idx = _skip(raw, idx + 1)
+
+def _project(raw, idx):
+    '''
+    one project is decoded in a single call of the c scanner and cut down right away,
+    so only one full project is ever alive next to the catalog
+    '''
+    project, idx = _decoder.raw_decode(raw, idx)
+    catalog = dict((key, project[key]) for key in project_fields if key in project)
+    catalog['tasks'] = [dict((key, task[key]) for key in task_fields if key in task) for task in project.get('tasks', [])]
+    return catalog, idx
+
+def _projects(raw, idx):
+    return _array(raw, idx, _project)
@@ -0,0 +1,102 @@
+'''
+runs blocking harvest and store work off the gtk main loop and hands the answer back to it
+
+>>> import gobject, Dispatcher
+>>> dispatcher = Dispatcher.Dispatcher(gobject.idle_add, on_busy=lambda busy: spinner.set_visible(busy))
+>>> dispatcher.run(harvest.get_today, done=render, failed=show_error) #returns right away, render(data) runs on the main loop
+>>> dispatcher.run(send, (entry,), key=entry.id) #jobs of the same key run one after the other, done included
+>>> dispatcher.stats()
+{'ran': 2, 'failed': 0, 'busy': 0, 'max_busy': 2, 'waited': 1}
+
+run, done, failed and on_busy are all on the main loop, only the jobs themselves are on a worker.
+jobs a done or failed callback runs on its own key go ahead of the ones already waiting on it, so a read
+and the writes decided from it are never split by the next read
+'''
+
+from Harvest import HarvestPool
+
+TODAY = 'today' #key of reads and writes of today's entries, they run in the order they were asked
+
+class Dispatcher(object):
+    def __init__(self, schedule, workers = 4, on_busy = None):
+        '''
+        schedule - schedule(fn, *args) runs fn once on the main loop, gobject.idle_add
+        on_busy - on_busy(True) when the first job starts, on_busy(False) when the last one was handed back
+        '''
+        self.schedule = schedule
+        self.on_busy = on_busy
+        self.pool = HarvestPool(workers)
+        self.busy = 0 #jobs not handed back yet
+        self.last_error = None #of a job without a failed callback
+
+        self._lanes = {} #key -> jobs waiting for the one of that key still running
+        self._handling = None #key of the job whose callback is running
+        self._follow_ups = [] #jobs that callback ran on its own key
+
+        self.ran = 0
+        self.failed = 0
+        self.max_busy = 0
+        self.waited = 0 #jobs held back behind another one of their key
+
+    def run(self, fn, args = (), done = None, failed = None, key = None):
+        '''
+        fn(*args) on a worker, then done(result) or failed(error) back on the main loop
+        key - jobs sharing it run in the order they were given, eg. an entry id for its read-modify-write
+        '''
+        job = (fn, args, done, failed, key)
+        self.busy += 1
+        self.max_busy = max(self.max_busy, self.busy)
+        if self.busy == 1 and self.on_busy:
+            self.on_busy(True)
+
+        if key is not None:
+            if key in self._lanes:
+                if key == self._handling:
+                    self._follow_ups.append(job)
+                else:
+                    self._lanes[key].append(job)
+                self.waited += 1
+                return
+            self._lanes[key] = []
+        self._start(job)
+
+    def stats(self):
+        return {'ran': self.ran, 'failed': self.failed, 'busy': self.busy, 'max_busy': self.max_busy,
+                'waited': self.waited}
+
+    def close(self):
+        self.pool.shutdown()
+
+    def _start(self, job):
+        fn, args = job[:2]
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self.schedule(self._deliver, job, f))
+
+    def _deliver(self, job, future):
+        fn, args, done, failed, key = job
+        self._handling, self._follow_ups = key, []
+        try:
+            error = future.exception()
+            if error is None:
+                self.ran += 1
+                if done:
+                    done(future.result())
+            else:
+                self.failed += 1
+                if failed:
+                    failed(error)
+                else:
+                    self.last_error = error
+        finally:
+            if key is not None: #the next one of this key only starts once this one is fully handled
+                lane = self._lanes.get(key)
+                lane[:0] = self._follow_ups
+                if lane:
+                    self._start(lane.pop(0))
+                else:
+                    self._lanes.pop(key, None)
+            self._handling, self._follow_ups = None, []
+            self.busy -= 1
+            if not self.busy and self.on_busy:
+                self.on_busy(False)
+        return False #run once
@@ -3,24 +3,464 @@
 >>> Harvest.HarvestStatus().get()
 u'up'
 >>> harvest = Harvest.Harvest("https://COMPANYNAME.harvestapp.com", "EMAIL", "PASSWORD")
+>>> harvest.warm_up() #optional, opens the pooled connection ahead of the first real call
 >>> data = {"notes":"test note", "project_id":"PROJECT_ID","hours":"1.0", "task_id": "TASK_ID"}
 >>> harvest.add(data)
 >>> data['notes'] = "another test"
 >>> harvest.update("ENTRY_ID", data)
 >>> harvest.get_today()
+>>> harvest.pool_stats()
+{'requests': 4, 'connections_opened': 1, 'connections_reused': 3}
+>>> harvest.get_today() #unchanged since last time, server answers 304 and the cached body is reused
+>>> harvest.cache_stats()
+{'hits': 1, 'misses': 1, 'bytes_saved': 123456}
+>>> user_id = harvest.who_am_i()['user']['id']
+>>> harvest.get_entries(user_id, "2013-01-15", "2013-01-15", updated_since=watermark) #only entries changed since then
+
+>>> harvest.update("ENTRY_ID", data) #posted together with the update above, only the latest data is sent
+>>> harvest.flush(5) #wait up to 5 seconds for queued mutations to reach harvest, always called on quit
+0
+>>> harvest.write_stats()
+{'queued': 3, 'posted': 2, 'collapsed': 1, 'pending': 0, 'failed': 0}
+
+mutations survive being offline and restarts when given a journal
+>>> harvest = Harvest.Harvest("https://COMPANYNAME.harvestapp.com", "EMAIL", "PASSWORD", outbox="data/config/outbox.journal")
+>>> harvest.add(data) #written to the journal, returns right away
+>>> harvest.pending()
+1
+>>> harvest.add(data, local_id="local-1") #shown under its local id until harvest answers with its own
+>>> harvest.update("local-1", data) #sent for the id harvest gave it
+>>> harvest.outbox.overlay(harvest.get_today(), adds=True) #pending adds listed too, under their local id
+>>> harvest.outbox.on_rejected = lambda op, error: undo(op) #harvest kept refusing op, it was dropped
+>>> harvest.outbox.queue({'op': 'toggle_timer', 'entry_id': "42"}, cause="timer-7") #queued once for every cause
+
+calls share a process wide token bucket, 429 answers are retried after their Retry-After
+>>> harvest.limiter_stats()
+{'waiting_interactive': 0, 'waiting_background': 0, 'acquired': 7, 'throttled': 0, 'average_wait': 0.0, 'max_wait': 0.0}
+
+identical reads running at the same time or within fresh_for seconds share one request, writes reset that
+>>> harvest.get_today(); harvest.get_today()
+>>> harvest.flight_stats()
+{'started': 1, 'joined': 0, 'fresh': 1}
+
+every call has a deadline per endpoint and reads can be cancelled, both raise a HarvestError subclass
+>>> harvest.client.timeouts['daily'] = 60 #big account, give the daily document longer
+>>> token = harvest.supersede('refresh') #cancels whatever refresh was still running
+>>> harvest.get_today(token=token)
+
+repeated failures open a circuit breaker, calls then fail fast with HarvestUnavailable
+>>> harvest.breaker_stats()
+{'state': 'closed', 'failures': 0, 'trips': 0, 'short_circuited': 0, 'retry_in': 0}
+
+every call is also available without blocking, methods return a HarvestFuture
+>>> client = Harvest.AsyncHarvest("https://COMPANYNAME.harvestapp.com", "EMAIL", "PASSWORD", workers=30)
+>>> days = client.gather([client.get_day(day, 2013) for day in range(1, 31)]) #30 days fetched at once
+>>> client.get_today().add_done_callback(lambda future: future.result())
 
 '''
 
+from datetime import datetime, date
+from time import time
+from threading import Thread, Lock, Event, Condition
+from Queue import Queue
+from urllib import urlencode
+from email.utils import parsedate_tz, mktime_tz
 from xml.dom.minidom import Document #to create xml out of dict
 
+import Decoder
+import Journal
+from Clock import Clock
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+def _private(body):
+    '''
+    a copy of an answer that is kept or shared, for a caller to change entries of in place. the project
+    catalog is by far the biggest part and nobody changes it, it stays shared
+    '''
+    if isinstance(body, dict):
+        return dict((key, value if key == 'projects' else _private(value)) for key, value in body.iteritems())
+    if isinstance(body, list):
+        return [_private(value) for value in body]
+    return body
+
 class HarvestError(Exception):
     pass
 
-class Harvest(object):
-    def __init__(self, uri, email, password):
+class HarvestConnectionError(HarvestError):
+    '''
+    harvest could not be reached at all, as opposed to answering with something we cant use
+    '''
+    pass
+
+class HarvestTimeout(HarvestConnectionError):
+    '''
+    the call ran past its deadline
+    '''
+    pass
+
+class HarvestDeadline(HarvestTimeout):
+    '''
+    the deadline passed before harvest was even called, eg. waiting out a Retry-After. says nothing about harvest
+    '''
+    pass
+
+class HarvestUnavailable(HarvestConnectionError):
+    '''
+    recent calls kept failing, the circuit is open and this one was not even tried
+    '''
+    pass
+
+class HarvestCancelled(HarvestError):
+    '''
+    the call was cancelled through its HarvestCancelToken, usually superseded by a newer one
+    '''
+    pass
+
+class HarvestServerError(HarvestError):
+    '''
+    harvest answered with a 5xx, counts against the circuit breaker
+    '''
+    pass
+
+class HarvestThrottled(HarvestError):
+    '''
+    harvest kept answering 429 after we waited as long as it asked
+    '''
+    pass
+
+class HarvestFuture(object):
+    '''
+    result of a call running on the HarvestPool
+    '''
+    def __init__(self):
+        self._event = Event()
+        self._lock = Lock()
+        self._result = None
+        self._error = None
+        self._callbacks = []
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout = None):
+        if not self._event.wait(timeout):
+            raise HarvestTimeout("Timed out waiting for Harvest")
+        if self._error:
+            raise self._error
+        return self._result
+
+    def exception(self, timeout = None):
+        if not self._event.wait(timeout):
+            raise HarvestTimeout("Timed out waiting for Harvest")
+        return self._error
+
+    def add_done_callback(self, fn):
+        '''
+        fn(future) is called from the worker thread once the call finished, right away if it already has
+        '''
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_result(self, result):
+        self._finish(result, None)
+
+    def set_exception(self, error):
+        self._finish(None, error)
+
+    def _finish(self, result, error):
+        with self._lock:
+            if self._event.is_set():
+                return #first answer wins
+            self._result = result
+            self._error = error
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for fn in callbacks:
+            fn(self)
+
+class HarvestCancelToken(object):
+    '''
+    cancels every call it was given to, the calls raise HarvestCancelled right away
+    and whatever harvest answers later is thrown away
+    '''
+    def __init__(self):
+        self.cancelled = False
+        self._futures = []
+        self._lock = Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.set_exception(HarvestCancelled("Cancelled"))
+
+    def check(self):
+        if self.cancelled:
+            raise HarvestCancelled("Cancelled")
+
+    def watch(self, future):
+        with self._lock:
+            if not self.cancelled:
+                self._futures.append(future)
+                return
+        future.set_exception(HarvestCancelled("Cancelled"))
+
+class HarvestPool(object):
+    '''
+    bounded pool of worker threads for blocking harvest calls, threads are started on demand
+    '''
+    def __init__(self, workers = 8):
+        self.workers = workers
+        self._queue = Queue()
+        self._threads = []
+        self._idle = 0
+        self._lock = Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = HarvestFuture()
+        with self._lock:
+            if self._queue.qsize() >= self._idle and len(self._threads) < self.workers:
+                t = Thread(target=self._work)
+                t.daemon = True #never keep the app alive on quit
+                self._threads.append(t)
+                t.start()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for t in threads:
+            self._queue.put(None)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self._idle += 1
+            job = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+            if job is None:
+                return
+
+            future, fn, args, kwargs = job
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+class HarvestRateLimiter(object):
+    '''
+    token bucket for harvest api calls, one is shared by every client in the process by default.
+    interactive calls (submit, stop) always get the next token before background refreshes
+    '''
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __init__(self, rate = 100 / 15.0, burst = 30):
+        '''
+        rate - tokens added per second, harvest allows 100 requests per 15 seconds per account
+        burst - most tokens saved up while idle
+        '''
+        self.rate = rate
+        self.burst = burst
+
+        self.tokens = float(burst)
+        self.blocked_until = 0 #harvest told us to back off until then
+        self.waiting = [0, 0] #callers waiting for a token, by priority
+        self.acquired = 0
+        self.throttled = 0 #429 answers seen
+        self.timed_out = 0 #callers whose deadline came before their token
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+        self._updated = time()
+        self._cond = Condition()
+
+    def acquire(self, priority = BACKGROUND, deadline = None):
+        '''
+        deadline - time() the call has to be sent by, HarvestTimeout right away when no token comes before it
+        '''
+        started = time()
+        with self._cond:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = self._refill()
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif priority == self.BACKGROUND and self.waiting[self.INTERACTIVE]:
+                        wait = 1 / self.rate #let the user's call go first
+                    elif self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    else:
+                        wait = (1 - self.tokens) / self.rate
+                    if deadline is not None and now + wait > deadline:
+                        self.timed_out += 1
+                        raise HarvestDeadline("No request to Harvest allowed for %0.1fs, past the deadline" % wait)
+                    self._cond.wait(wait)
+            finally:
+                self.waiting[priority] -= 1
+                self._cond.notify_all()
+
+            waited = time() - started
+            self.acquired += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def retry_after(self, seconds):
+        '''
+        harvest answered 429, nobody in the process calls again before seconds passed
+        '''
+        with self._cond:
+            self.throttled += 1
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time() + seconds)
+            self._cond.notify_all()
+
+    def stats(self):
+        return {
+            'waiting_interactive': self.waiting[self.INTERACTIVE],
+            'waiting_background': self.waiting[self.BACKGROUND],
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'timed_out': self.timed_out,
+            'average_wait': self.total_wait / self.acquired if self.acquired else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+    def _refill(self):
+        now = time()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+rate_limiter = HarvestRateLimiter() #shared by every client unless one is given its own
+
+class HarvestCircuitBreaker(object):
+    '''
+    tracks real api calls, after threshold failures in a row calls fail fast until a single
+    half open probe gets through, every failed probe doubles the wait up to max_timeout
+    '''
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold = 3, timeout = 5, max_timeout = 300, on_trip = None):
+        '''
+        on_trip - called once every time the circuit opens from closed
+        '''
+        self.threshold = threshold
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+        self.on_trip = on_trip
+
+        self.state = self.CLOSED
+        self.failures = 0 #failures in a row
+        self.trips = 0
+        self.short_circuited = 0 #calls refused while open
+
+        self._current_timeout = timeout
+        self._open_until = 0
+        self._lock = Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time() >= self._open_until:
+                self.state = self.HALF_OPEN #let this one call through as the probe
+                return True
+            self.short_circuited += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._current_timeout = self.timeout
+
+    def release(self):
+        '''
+        the call let through ended without an answer or a failure, eg. cancelled. a probe frees its slot
+        so the next call probes again
+        '''
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self._current_timeout = min(self._current_timeout * 2, self.max_timeout)
+                self._open()
+                return
+            if self.state == self.CLOSED and self.failures >= self.threshold:
+                self.trips += 1
+                self._open()
+                tripped = True
+            else:
+                tripped = False
+
+        if tripped and self.on_trip:
+            self.on_trip()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'short_circuited': self.short_circuited,
+            'retry_in': max(self._open_until - time(), 0) if self.state != self.CLOSED else 0,
+        }
+
+    def _open(self):
+        self.state = self.OPEN
+        self._open_until = time() + self._current_timeout
+
+class AsyncHarvest(object):
+    '''
+    harvest client whose calls run on a pool of workers sharing one keep-alive session,
+    every api method returns a HarvestFuture instead of blocking
+    '''
+    pool_connections = 2 #number of hosts to keep pools for, harvest api and harvest status
+    throttle_retries = 3 #times a 429 is retried after its Retry-After before giving up
+    default_retry_after = 15 #seconds to back off when a 429 doesnt say
+    connect_timeout = 3.05 #seconds to open a connection, a bit over a tcp retransmit window
+    timeouts = { #seconds each endpoint has from being called until it must have answered
+        'daily': 20, #the whole project catalog comes with it
+        'show': 10,
+        'entries': 20,
+        'who_am_i': 10,
+        'timer': 10,
+        'add': 10,
+        'update': 10,
+        'delete': 10,
+        'status': 5,
+    }
+    reads = ('daily', 'show', 'entries', 'who_am_i') #endpoints that never change anything on harvest
+    decoders = { #endpoint -> function decoding the raw body, Decoder.decode when not listed
+        'entries': Decoder.decode_entries,
+    }
+
+    def __init__(self, uri, email, password, workers = 8, limiter = None, timeouts = None, fresh_for = 2.0,
+                 decoders = None, clock = None):
+        '''
+        clock - Clock.Clock told harvest's time from the Date of every answer, shared with the timer
+        timeouts - overrides for the per endpoint deadlines, eg. {'daily': 60}
+        fresh_for - seconds an answered read is handed to identical reads without asking again, 0 turns it off
+        decoders - endpoint -> function decoding the raw body, eg. {'daily': Decoder.decode_daily} for big accounts
+        '''
         self.uri = uri
         self.email = email
         self.password = password
@@ -29,53 +469,896 @@ class Harvest(object):
             'User-Agent': 'TimeTracker for Linux',
         }
 
+        #one long lived session, so every call reuses the same keep-alive connection and auth
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(self.email, self.password)
+        self.session.headers.update(self.headers)
+        #one connection per worker so concurrent calls never throw away a kept-alive connection
+        self.adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=workers)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+        self.pool = HarvestPool(workers)
+        self.limiter = limiter or rate_limiter
+        self.breaker = HarvestCircuitBreaker(on_trip=self._probe_status)
+        self.status_page = None #what harveststatus.com said the last time the breaker tripped
+
+        #conditional request cache for daily documents, url -> validators and parsed body
+        self.validators = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_bytes_saved = 0
+        self._cache_lock = Lock()
+
+        self.offline = False #last read could not reach harvest and was answered from the cache
+
+        self.timeouts = dict(AsyncHarvest.timeouts, **(timeouts or {}))
+        self.decoders = dict(AsyncHarvest.decoders, **(decoders or {}))
+        self._tokens = {} #key -> token of the newest call made under that key
+        self._tokens_lock = Lock()
+
+        #single flight, identical reads in flight or answered within fresh_for share one request
+        self.fresh_for = fresh_for
+        self.flights_started = 0
+        self.flights_joined = 0 #reads that joined a request still in flight
+        self.flights_fresh = 0 #reads answered from a request that just finished
+        self._flights = {} #url -> flight
+        self._flights_lock = Lock()
+
+        self.clock = clock or Clock()
+
     def status(self):
-        return self._request("GET", 'http://harveststatus.com/status.json')
+        return self._submit('status', "GET", 'http://harveststatus.com/status.json')
+
+    #reads are background refreshes unless the user is waiting on them, writes always are interactive.
+    #reads can be given a HarvestCancelToken, writes are never cancelled, the outbox owns them
+
+    def get_today(self, interactive = False, token = None):
+        return self._submit('daily', 'GET', "%s/daily" % self.uri, cache=True, interactive=interactive, token=token)
 
-    def get_today(self):
-        return self._request('GET', "%s/daily" % self.uri)
+    def get_day(self, day_of_the_year = None, year = None, interactive = False, token = None, params = None,
+                cache = True):
+        '''
+        day_of_the_year, year - default to today
+        params - extra query parameters, eg. {'slim': 1} leaves the project catalog out
+        cache - keep the answer for conditional requests, off for one time reads like a backfill
+        '''
+        today = datetime.now().timetuple()
+        url = '%s/daily/%s/%s' % (self.uri, day_of_the_year or today.tm_yday, year or today.tm_year)
+        if params:
+            url += '?' + urlencode(sorted(params.items()))
+        return self._submit('daily', 'GET', url, cache=cache, interactive=interactive, token=token)
 
-    def get_day(self, day_of_the_year=1, year=2012):
-        return self._request('GET', '%s/daily/%s/%s' % (self.uri, day_of_the_year, year))
+    def get_entry(self, entry_id, interactive = False, token = None):
+        return self._submit('show', "GET", "%s/daily/show/%s" % (self.uri, entry_id), interactive=interactive,
+                            token=token)
 
-    def get_entry(self, entry_id):
-        return self._request("GET", "%s/daily/show/%s" % (self.uri, entry_id))
+    def get_entries(self, user_id, start, end, updated_since = None, interactive = False, token = None):
+        '''
+        entries of user_id spent from start to end, iso dates both included, as a list of entries
+        updated_since - epoch seconds on harvest's clock, only entries changed since then are sent.
+                        deleted entries are never reported, a delta needs a full daily now and then
+        '''
+        params = {'from': start.replace('-', ''), 'to': end.replace('-', '')}
+        if updated_since is not None:
+            params['updated_since'] = datetime.utcfromtimestamp(updated_since).strftime("%Y-%m-%d %H:%M")
+        return self._submit('entries', 'GET', '%s/people/%s/entries?%s' % (self.uri, user_id,
+                            urlencode(sorted(params.items()))), interactive=interactive, token=token)
+
+    def who_am_i(self, interactive = False, token = None):
+        return self._submit('who_am_i', 'GET', '%s/account/who_am_i' % self.uri, interactive=interactive,
+                            token=token)
+
+    @property
+    def clock_offset(self):
+        '''
+        seconds harvest's clock is ahead of ours, from the Date of its answers
+        '''
+        return self.clock.offset
+
+    def server_time(self):
+        '''
+        now on harvest's clock, as far as its answers told us
+        '''
+        return self.clock.server_time()
 
     def toggle_timer(self, entry_id):
-        return self._request("GET", "%s/daily/timer/%s" % (self.uri, entry_id))
+        return self._submit('timer', "GET", "%s/daily/timer/%s" % (self.uri, entry_id), interactive=True)
 
     def add(self, data):
-        return self._request("POST", '%s/daily/add' % self.uri, data)
+        return self._submit('add', "POST", '%s/daily/add' % self.uri, data, interactive=True)
 
     def delete(self, entry_id):
-        return self._request("DELETE", "%s/daily/delete/%s" % (self.uri, entry_id))
+        return self._submit('delete', "DELETE", "%s/daily/delete/%s" % (self.uri, entry_id), interactive=True)
 
     def update(self, entry_id, data):
-        return self._request('POST', '%s/daily/update/%s' % (self.uri, entry_id), data)
-    def _request(self, type = "GET", url = "", data = None):
-        if type != "DELETE":
-            if data:
-                r = requests.post(url, data=data, headers=self.headers, auth=HTTPBasicAuth(self.email, self.password))
-            else:
-                if not url.endswith(".json"): #dont put headers it a status request
-                    r = requests.get(url=url, headers=self.headers, auth=HTTPBasicAuth(self.email, self.password))
+        return self._submit('update', 'POST', '%s/daily/update/%s' % (self.uri, entry_id), data, interactive=True)
+
+    def supersede(self, key):
+        '''
+        cancel the last call made under key and hand out the token for the next one,
+        eg. a second project switch cancelling the refresh the first one started
+        '''
+        token = HarvestCancelToken()
+        with self._tokens_lock:
+            previous = self._tokens.get(key)
+            self._tokens[key] = token
+        if previous:
+            previous.cancel()
+        return token
+
+    def gather(self, futures, timeout = None):
+        '''
+        wait for all futures, results come back in the same order
+        '''
+        return [future.result(timeout) for future in futures]
+
+    def warm_up(self):
+        '''
+        open the pooled connection ahead of time, used on startup and after resume
+        '''
+        return self.pool.submit(self._warm_up)
+
+    def pool_stats(self):
+        '''
+        connection pool counters summed over every host pool
+        '''
+        stats = {'requests': 0, 'connections_opened': 0, 'connections_reused': 0}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool:
+                stats['requests'] += pool.num_requests
+                stats['connections_opened'] += pool.num_connections
+
+        stats['connections_reused'] = max(stats['requests'] - stats['connections_opened'], 0)
+        return stats
+
+    def cache_stats(self):
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'bytes_saved': self.cache_bytes_saved}
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self.validators = {}
+
+    def close(self):
+        self.pool.shutdown()
+        self.session.close()
+
+    def _submit(self, endpoint, type, url, *args, **kwargs):
+        token = kwargs.get('token')
+        if token:
+            token.check()
+
+        if endpoint in self.reads:
+            return self._single_flight(endpoint, type, url, token, kwargs)
+
+        if endpoint != 'status': #a write, anything read before it is stale now
+            self.forget_reads()
+        kwargs['deadline'] = time() + self.timeouts[endpoint]
+        kwargs['endpoint'] = endpoint
+        future = self.pool.submit(self._request, type, url, *args, **kwargs)
+        if token:
+            token.watch(future)
+        elif endpoint != 'status':
+            future.add_done_callback(lambda f: self.forget_reads()) #reads that overlapped the write too
+        return future
+
+    def forget_reads(self):
+        with self._flights_lock:
+            self._flights = {}
+
+    def flight_stats(self):
+        return {'started': self.flights_started, 'joined': self.flights_joined, 'fresh': self.flights_fresh}
+
+    def _single_flight(self, endpoint, type, url, token, kwargs):
+        '''
+        hand the caller its own future on a shared request, every caller gets its own copy of the entries
+        and the request itself is only cancelled once every caller sharing it was cancelled
+        '''
+        started = False
+        with self._flights_lock:
+            flight = self._flights.get(url)
+            if flight and flight['done_at'] is not None and time() - flight['done_at'] > self.fresh_for:
+                flight = None #too old to share
+
+            if not flight:
+                self._prune_flights()
+
+            if flight:
+                if flight['future'].done():
+                    self.flights_fresh += 1
                 else:
-                    r = requests.get(url)
+                    self.flights_joined += 1
+            else:
+                flight = {'token': HarvestCancelToken(), 'waiters': 0, 'done_at': None}
+                kwargs['token'] = flight['token']
+                kwargs['deadline'] = time() + self.timeouts[endpoint]
+                kwargs['endpoint'] = endpoint
+                flight['future'] = self.pool.submit(self._request, type, url, **kwargs)
+                self._flights[url] = flight
+                self.flights_started += 1
+                started = True
+            flight['waiters'] += 1
 
-            try:
-                return r.json
-            except Exception as e:
-                raise HarvestError(e)
+        if started: #outside the lock, a future already done calls _landed right away and it takes the lock
+            flight['future'].add_done_callback(lambda f: self._landed(url, flight))
+        future = HarvestFuture()
+        if token:
+            token.watch(future)
+            future.add_done_callback(lambda f: self._left(url, flight, f))
+        flight['future'].add_done_callback(lambda f: self._copy_to(f, future))
+        return future
+
+    def _prune_flights(self):
+        '''
+        drop answers too old to share, a backfill reads hundreds of distinct days
+        '''
+        now = time()
+        for url, flight in self._flights.items():
+            if flight['done_at'] is not None and now - flight['done_at'] > self.fresh_for:
+                del self._flights[url]
+
+    def _landed(self, url, flight):
+        with self._flights_lock:
+            flight['done_at'] = time()
+            if flight['future'].exception() or not self.fresh_for:
+                if self._flights.get(url) is flight:
+                    del self._flights[url] #only share answers, not errors
+
+    def _left(self, url, flight, future):
+        if isinstance(future.exception(), HarvestCancelled):
+            with self._flights_lock:
+                flight['waiters'] -= 1
+                abandoned = flight['waiters'] <= 0 and not flight['future'].done()
+                if abandoned and self._flights.get(url) is flight:
+                    del self._flights[url] #dont let a new caller join a cancelled request
+            if abandoned:
+                flight['token'].cancel()
 
+    def _copy_to(self, shared, future):
+        error = shared.exception()
+        if error:
+            future.set_exception(error)
         else:
+            future.set_result(_private(shared.result())) #callers modify entries in place, the catalog is shared
+
+    def _warm_up(self):
+        try:
+            #a connection black holed by a network change must not hold a worker, give it the connect deadline
+            self.session.head(self.uri, allow_redirects=False, timeout=(self.connect_timeout, self.connect_timeout))
+            return True
+        except Exception:
+            return False #nothing to warm, the real call will report the error
+
+    def _request(self, type = "GET", url = "", data = None, cache = False, interactive = False, token = None,
+                 deadline = None, endpoint = None):
+        if url.endswith(".json"): #status request, different host, dont send our auth or headers to it
+            return self._decode(requests.get(url, timeout=self._timeout(deadline)), endpoint)
+
+        try:
+            if not self.breaker.allow():
+                raise HarvestUnavailable("Harvest keeps failing, next try in %ds" % self.breaker.stats()['retry_in'])
+            #any answer below 500 is a success, _throttled_request records it as soon as it has one
+            try:
+                return self._send(type, url, data, cache, interactive, token, deadline, endpoint)
+            except HarvestDeadline:
+                raise #never got to harvest, not a failure of it
+            except (HarvestServerError, HarvestTimeout):
+                self.breaker.failure()
+                raise
+            except requests.Timeout as e:
+                self.breaker.failure()
+                raise HarvestTimeout(e)
+            except requests.RequestException as e:
+                self.breaker.failure()
+                raise HarvestConnectionError(e)
+            finally:
+                self.breaker.release() #cancelled before an answer, dont hold the probe forever
+        except HarvestConnectionError:
+            cached = self.validators.get(url) if cache else None
+            if cached: #cant reach harvest, the last copy we have is better than nothing
+                self.offline = True
+                return _private(cached['body'])
+            raise
+
+    def _send(self, type, url, data, cache, interactive, token, deadline, endpoint):
+        cached = self.validators.get(url) if cache else None
+        sent = self.clock.now()
+        r = self._throttled_request(type, url, data, self._conditional_headers(cached), interactive, token, deadline)
+        self.offline = False
+        self._server_date(r, sent)
+
+        if cached and r.status_code == 304: #not modified, reuse what we parsed last time
+            with self._cache_lock:
+                self.cache_hits += 1
+                self.cache_bytes_saved += cached['size']
+            return _private(cached['body']) #callers modify entries in place, keep ours clean
+
+        if r.status_code >= 500:
+            raise HarvestServerError("Harvest answered %s %s" % (r.status_code, r.reason))
+        if r.status_code >= 400 and not (type == "DELETE" and r.status_code == 404): #already gone is fine
+            raise HarvestError("Harvest answered %s %s" % (r.status_code, r.reason))
+
+        if type == "DELETE":
+            return
+
+        body = self._decode(r, endpoint)
+        if cache:
+            self._store_validators(url, r, body)
+            return _private(body) #the cache keeps body itself
+        return body
+
+    def _throttled_request(self, type, url, data, headers, interactive, token, deadline):
+        priority = HarvestRateLimiter.INTERACTIVE if interactive else HarvestRateLimiter.BACKGROUND
+        for attempt in range(self.throttle_retries + 1):
+            self.limiter.acquire(priority, deadline)
+            if token:
+                token.check() #superseded while it waited, dont spend a request on it
+            r = self.session.request(type, url, data=data, headers=headers, timeout=self._timeout(deadline))
+            if r.status_code < 500:
+                self.breaker.success() #harvest answered, a 4xx or a throttle is still an answer
+            if r.status_code != 429:
+                return r
+            self.limiter.retry_after(self._retry_after(r))
+        raise HarvestThrottled("Harvest is throttling requests, retry after %ss" % self._retry_after(r))
+
+    def _timeout(self, deadline):
+        '''
+        requests timeout for what is left of the deadline
+        '''
+        remaining = deadline - time()
+        if remaining <= 0:
+            raise HarvestDeadline("Deadline passed before Harvest was called")
+        return (min(self.connect_timeout, remaining), remaining)
+
+    def _retry_after(self, r):
+        value = r.headers.get('Retry-After', '')
+        if value.isdigit():
+            return int(value)
+        date = parsedate_tz(value)
+        if date:
+            return max(mktime_tz(date) - time(), 0)
+        return self.default_retry_after
+
+    def _server_date(self, r, sent):
+        date = parsedate_tz(r.headers.get('Date', ''))
+        if date:
+            self.clock.observe(mktime_tz(date), sent, self.clock.now())
+
+    def _probe_status(self):
+        '''
+        the breaker just tripped, ask harveststatus.com whether it is harvest or our network
+        '''
+        def probed(future):
+            try:
+                self.status_page = future.result()['status']
+            except Exception:
+                self.status_page = None #cant reach that either, most likely our network
+        self.status().add_done_callback(probed)
+
+    def _decode(self, r, endpoint):
+        try:
+            return self.decoders.get(endpoint, Decoder.decode)(r.content)
+        except Decoder.DecodeError as e:
+            raise HarvestError(e)
+
+    def _conditional_headers(self, cached):
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def _store_validators(self, url, r, body):
+        etag = r.headers.get('ETag')
+        last_modified = r.headers.get('Last-Modified')
+        with self._cache_lock:
+            self.cache_misses += 1
+            if r.status_code == 200 and (etag or last_modified):
+                self.validators[url] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'body': body, #never handed out, callers get a _private copy
+                    'size': len(r.content),
+                }
+            else:
+                self.validators.pop(url, None) #server stopped sending validators, dont keep stale data
+
+class HarvestOutbox(object):
+    '''
+    append-only journal of add, update, delete and toggle_timer calls, written before the caller
+    gets control back and replayed in order by a background thread whenever harvest is reachable.
+
+    updates of the same entry queued within window seconds of each other go out as one POST,
+    the latest notes and hours win since every update carries the whole entry.
+
+    journal lines are json, {"seq": .., "op": .., ...} for a mutation, {"sent": seq} before it is posted
+    and {"ack": seq} once harvest answered, so a crash replays anything not acked and checks the
+    ones that may have made it already
+
+    an add is known by a local id until harvest answers with its own, later updates, deletes and
+    toggles of that local id are sent for the id harvest gave it
+    '''
+    backoff = (2, 4, 8, 15, 30, 60) #seconds between replays while harvest cant be reached
+    max_attempts = 5 #harvest answered but not with what we expected, give up on the op after this
+
+    def __init__(self, client, path = None, window = 2.0):
+        self.client = client
+        self.path = path #None keeps the journal in memory only
+        self.window = window
+
+        self.queued = 0 #mutations handed to us
+        self.posted = 0 #mutations actually sent to harvest
+        self.collapsed = 0 #updates merged into a later one or dropped by a delete
+        self.failed = [] #ops harvest kept rejecting, kept for the user to see
+        self.last_error = None #error of the last replay attempt
+        self.offline = False #the last replay attempt could not reach harvest
+        self.on_posted = None #on_posted(op) from the replay thread once harvest took op
+        self.on_rejected = None #on_rejected(op, error) from the replay thread once op was given up on
+
+        self._ops = [] #pending ops in journal order
+        self._added = {} #local id of an add -> id harvest gave it
+        self._seq = 0
+        self._retries = 0
+        self._retry_at = 0
+        self._stopped = False
+        self._idle = True
+        self._cond = Condition()
+
+        self._load()
+
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def queue(self, write, cause = None):
+        '''
+        queue a write given as its op, {'op': 'update', 'entry_id': .., 'data': ..} and the like, returns the op
+        cause - what the write comes from, eg. the timer event it was journaled with. a write whose cause
+        is still pending or was given up on is not queued again
+        '''
+        with self._cond:
+            for op in self._ops + self.failed:
+                if cause and op.get('cause') == cause:
+                    return op
+            op = dict(write)
+            if cause:
+                op['cause'] = cause
+            if 'data' in op:
+                op['data'] = dict(op['data'])
+            if op['op'] == 'add':
+                #the day it is queued on is kept with it, a replay after midnight still files it on that day
+                op['data'].setdefault('spent_at', date.today().isoformat())
+                op.setdefault('local_id', None)
+            else:
+                op['entry_id'] = str(op['entry_id'])
+            return self._put(op)
+
+    def add(self, data, local_id = None):
+        '''
+        local_id - what the entry is called until harvest has it, queued-<seq> when not given
+        '''
+        op = self.queue({'op': 'add', 'data': data, 'local_id': local_id})
+        return dict(op['data'], queued=op['seq'], id=self._local_id(op))
+
+    def update(self, entry_id, data):
+        self.queue({'op': 'update', 'entry_id': entry_id, 'data': data})
+        entry = self.pending_update(entry_id) or {}
+        entry['id'] = str(entry_id)
+        return entry
+
+    def delete(self, entry_id):
+        with self._cond:
+            #updates nobody has tried to send yet are pointless once the entry is gone
+            for op in [o for o in self._ops if o['op'] == 'update' and o['entry_id'] == str(entry_id) and not o['sent']]:
+                self._ops.remove(op)
+                self._write({'ack': op['seq']})
+                self.collapsed += 1
+        self.queue({'op': 'delete', 'entry_id': entry_id})
+
+    def toggle_timer(self, entry_id):
+        op = self.queue({'op': 'toggle_timer', 'entry_id': entry_id})
+        return {'id': str(entry_id), 'queued': op['seq']}
+
+    def pending_update(self, entry_id):
+        '''
+        merged data of every update still waiting for entry_id, None if there are none
+        '''
+        with self._cond:
+            data = None
+            for op in self._ops:
+                if op['op'] == 'update' and op['entry_id'] == str(entry_id):
+                    data = dict(data or {}, **op['data'])
+                    data['updated_at'] = op['queued_at']
+            return data
+
+    def overlay(self, harvest_data, adds = False):
+        '''
+        apply pending updates to a fresh daily document so reads see our own writes
+        adds - also list pending adds under their local id, never for a document that gets stored
+        '''
+        entries = harvest_data.get('day_entries', []) if isinstance(harvest_data, dict) else []
+        if adds:
+            day = harvest_data.get('for_day') if isinstance(harvest_data, dict) else None
+            with self._cond:
+                added = [op for op in self._ops if op['op'] == 'add' and
+                         (not day or op['data'].get('spent_at', day) == day)]
+            for op in added:
+                entry = {'id': self._local_id(op), 'notes': "", 'hours': 0.0, 'created_at': op['queued_at']}
+                self._apply(entry, dict(op['data'], updated_at=op['queued_at']))
+                entries.append(entry)
+        for entry in entries:
+            data = self.pending_update(entry.get('id'))
+            if data:
+                self._apply(entry, data)
+        return harvest_data
+
+    def depth(self):
+        return len(self._ops)
+
+    def kick(self):
+        '''
+        retry right away instead of waiting out the backoff, eg. after a resume
+        '''
+        with self._cond:
+            self._retry_at = 0
+            self._cond.notify_all()
+
+    def flush(self, timeout = None):
+        '''
+        wait until everything queued made it to harvest or timeout passed, returns how many are left
+        '''
+        deadline = time() + timeout if timeout is not None else None
+        with self._cond:
+            self._retry_at = 0
+            for op in self._ops:
+                op['ready_at'] = 0 #dont wait for more updates to merge
+            self._cond.notify_all()
+            while (self._ops or not self._idle) and not self._stopped:
+                remaining = deadline - time() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining if remaining is not None else 1)
+            return len(self._ops)
+
+    def stats(self):
+        return {'queued': self.queued, 'posted': self.posted, 'collapsed': self.collapsed,
+                'pending': len(self._ops), 'failed': len(self.failed)}
+
+    def close(self, timeout = 5):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join(timeout) #let an in flight op finish and ack, the journal keeps the rest
+
+    def harvest_id(self, entry_id):
+        '''
+        id harvest knows entry_id by, entry_id itself unless it is the local id of an add
+        '''
+        return self._added.get(str(entry_id), entry_id)
+
+    def _put(self, op):
+        with self._cond:
+            self._seq += 1
+            op['seq'] = self._seq
+            #shown as the entry's updated_at until harvest answers, so on harvest's clock
+            op['queued_at'] = datetime.utcfromtimestamp(self.client.clock.server_time()).strftime("%Y-%m-%dT%H:%M:%SZ")
+            self._write(op)
+            self._remember(op, time())
+            self.queued += 1
+            self._cond.notify_all()
+        return op
+
+    def _remember(self, op, now):
+        op['sent'] = op.get('sent', False)
+        op['attempts'] = 0
+        op['ready_at'] = now + self.window if op['op'] == 'update' else now
+        self._ops.append(op)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._idle = True
+                self._cond.notify_all()
+                while not self._stopped:
+                    wait = self._wait_time()
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+                if self._stopped:
+                    return
+                self._idle = False
+                batch = self._batch()
+                for op in batch:
+                    if not op['sent']:
+                        op['sent'] = True
+                        self._write({'sent': op['seq']})
+
             try:
-                r = requests.delete(url, headers=self.headers, auth=HTTPBasicAuth(self.email, self.password))
+                self._send(batch)
             except Exception as e:
-                raise HarvestError(e)
+                self._failed(batch, e)
+            else:
+                self._done(batch)
+
+    def _wait_time(self):
+        if not self._ops:
+            return None
+        now = time()
+        ready_at = max(self._ops[0]['ready_at'], self._retry_at)
+        return 0 if ready_at <= now else ready_at - now
+
+    def _batch(self):
+        '''
+        the head op, plus every later update of the same entry when the head is an update
+        '''
+        head = self._ops[0]
+        batch = [head]
+        if head['op'] == 'update':
+            for op in self._ops[1:]:
+                if op.get('entry_id') != head['entry_id']:
+                    continue
+                if op['op'] != 'update':
+                    break #keep the order around deletes and timer toggles
+                batch.append(op)
+        return batch
+
+    def _send(self, batch):
+        head = batch[0]
+        if head['op'] == 'add':
+            if head['sent'] and head['attempts']:
+                head['harvest_id'] = self._already_added(head['data'])
+                if head['harvest_id']:
+                    return
+            entry = self.client.add(head['data']).result()
+            if isinstance(entry, dict):
+                entry = entry.get('day_entry', entry)
+            if isinstance(entry, dict) and 'id' in entry:
+                head['harvest_id'] = str(entry['id'])
+                if 'timer_started_at' in entry:
+                    self.client.toggle_timer(entry['id']).result() #harvest started its own timer, we time locally
+            return
+
+        entry_id = self.harvest_id(head['entry_id'])
+        if entry_id in [self._local_id(op) for op in self.failed if op['op'] == 'add']:
+            raise HarvestError("Entry %s was never added to Harvest" % head['entry_id'])
+
+        if head['op'] == 'update':
+            data = {}
+            for op in batch:
+                data.update(op['data'])
+            self.client.update(entry_id, data).result()
+
+        elif head['op'] == 'delete':
+            self.client.delete(entry_id).result()
+
+        elif head['op'] == 'toggle_timer':
+            if head['attempts'] and not self._timer_running(entry_id):
+                return #toggles only ever stop timers, it already happened
+            self.client.toggle_timer(entry_id).result()
+
+    def _already_added(self, data):
+        '''
+        an add we may have sent before a crash, look for it on its day before adding it twice. returns its id
+        '''
+        if data.get('spent_at'):
+            day = datetime.strptime(data['spent_at'], "%Y-%m-%d").timetuple()
+            found = self.client.get_day(day.tm_yday, day.tm_year, True, cache=False)
+        else: #queued before adds kept their day
+            found = self.client.get_today(True)
+        for entry in found.result().get('day_entries', []):
+            if str(entry.get('project_id')) == str(data.get('project_id')) and \
+               str(entry.get('task_id')) == str(data.get('task_id')) and \
+               entry.get('notes') == data.get('notes'):
+                return str(entry.get('id'))
+        return None
+
+    def _local_id(self, op):
+        return op.get('local_id') or "queued-%s" % op['seq']
+
+    def _timer_running(self, entry_id):
+        entry = self.client.get_entry(entry_id, True).result()
+        entry = entry.get('day_entry', entry) if isinstance(entry, dict) else {}
+        return bool(entry.get('timer_started_at'))
+
+    def _done(self, batch):
+        with self._cond:
+            for op in batch:
+                self._ops.remove(op)
+                if op.get('harvest_id'):
+                    self._added[self._local_id(op)] = op['harvest_id']
+                    self._write({'ack': op['seq'], 'id': op['harvest_id']})
+                else:
+                    self._write({'ack': op['seq']})
+            self.posted += 1
+            self.collapsed += len(batch) - 1
+            self.offline = False
+            self.last_error = None
+            self._retries = 0
+            self._retry_at = 0
+            self._compact()
+            self._cond.notify_all()
+        if self.on_posted:
+            for op in batch:
+                self.on_posted(op)
+
+    def _failed(self, batch, e):
+        with self._cond:
+            self.last_error = e
+            self.offline = isinstance(e, HarvestConnectionError)
+            retryable = isinstance(e, (HarvestConnectionError, HarvestServerError, HarvestThrottled))
+            head = batch[0]
+            head['attempts'] += 1
+            if not retryable and head['attempts'] >= self.max_attempts:
+                #harvest is there but keeps refusing it, dont hold up everything queued behind it
+                self._ops.remove(head)
+                self._write({'ack': head['seq'], 'failed': str(e)})
+                self.failed.append(head)
+            else:
+                head = None
+                self._retry_at = time() + self.backoff[min(self._retries, len(self.backoff) - 1)]
+                self._retries += 1
+            self._cond.notify_all()
+        if head and self.on_rejected:
+            self.on_rejected(head, e)
+
+    def _apply(self, entry, data):
+        if 'notes' in data:
+            entry['notes'] = data['notes']
+        if 'hours' in data:
+            entry['hours'] = float(data['hours']) #harvest answers with numbers, we queue strings too
+        for key in ('project_id', 'task_id'):
+            if key in data and str(data[key]).isdigit():
+                entry[key] = int(data[key])
+        entry['updated_at'] = data['updated_at'] #what harvest will say once posted
+
+    def _load(self):
+        if not self.path:
+            return
+
+        ops = {}
+        sent = set()
+        for record in Journal.read(self.path):
+            if 'ack' in record:
+                op = ops.pop(record['ack'], None)
+                if op and record.get('id'):
+                    self._added[self._local_id(op)] = record['id'] #later ops of the same entry need it
+            elif 'sent' in record:
+                sent.add(record['sent'])
+            else:
+                ops[record['seq']] = record
+            self._seq = max(self._seq, record.get('seq', record.get('ack', record.get('sent', 0))))
+
+        now = time()
+        for seq in sorted(ops.keys()):
+            op = ops[seq]
+            op['sent'] = seq in sent
+            self._remember(op, now)
+            if op['sent']:
+                op['attempts'] = 1 #may have reached harvest, check before sending again
+        self._compact()
+
+    def _write(self, record):
+        if self.path:
+            Journal.append(self.path, record)
+
+    def _compact(self):
+        if not self.path or self._ops:
+            return
+        Journal.rewrite(self.path, []) #everything acked, start the journal over
+
+class Harvest(object):
+    '''
+    blocking harvest client, a thin wrapper waiting on AsyncHarvest
+    '''
+    def __init__(self, uri, email, password, outbox = None, **options):
+        '''
+        outbox - path of the journal for mutations, None keeps it in memory
+        options - passed on to AsyncHarvest, eg. decoders={'daily': Decoder.decode_daily}
+        '''
+        self.uri = uri
+        self.email = email
+        self.password = password
+        self.client = AsyncHarvest(uri, email, password, **options)
+        self.outbox = HarvestOutbox(self.client, outbox)
+
+    def status(self):
+        return self.client.status().result()
+
+    def get_today(self, interactive = False, token = None):
+        return self.outbox.overlay(self.client.get_today(interactive, token).result())
+
+    def get_day(self, day_of_the_year = None, year = None, interactive = False, token = None, params = None,
+                cache = True):
+        return self.outbox.overlay(self.client.get_day(day_of_the_year, year, interactive, token, params,
+                                                       cache).result())
+
+    def get_entry(self, entry_id, interactive = False, token = None):
+        return self.client.get_entry(entry_id, interactive, token).result()
+
+    def get_entries(self, user_id, start, end, updated_since = None, interactive = False, token = None):
+        entries = self.client.get_entries(user_id, start, end, updated_since, interactive, token).result()
+        return self.outbox.overlay({'day_entries': entries})['day_entries']
+
+    def who_am_i(self, interactive = False, token = None):
+        return self.client.who_am_i(interactive, token).result()
+
+    def server_time(self):
+        return self.client.server_time()
+
+    def supersede(self, key):
+        return self.client.supersede(key)
+
+    #mutations are journaled and return right away, the outbox sends them in order
+
+    def toggle_timer(self, entry_id):
+        return self.outbox.toggle_timer(entry_id)
+
+    def add(self, data, local_id = None):
+        return self.outbox.add(data, local_id)
+
+    def delete(self, entry_id):
+        return self.outbox.delete(entry_id)
+
+    def update(self, entry_id, data):
+        return self.outbox.update(entry_id, data)
+
+    def flush(self, timeout = None):
+        return self.outbox.flush(timeout)
+
+    def pending(self):
+        return self.outbox.depth()
+
+    def is_offline(self):
+        return self.client.offline or self.outbox.offline
+
+    def write_stats(self):
+        return self.outbox.stats()
+
+    def limiter_stats(self):
+        return self.client.limiter.stats()
+
+    def flight_stats(self):
+        return self.client.flight_stats()
+
+    def breaker_stats(self):
+        return self.client.breaker.stats()
+
+    def is_down(self):
+        '''
+        circuit is open and harveststatus.com agreed harvest is down when it tripped
+        '''
+        return self.client.breaker.state != HarvestCircuitBreaker.CLOSED and self.client.status_page == "down"
+
+    def warm_up(self, background = True):
+        '''
+        open the pooled connection ahead of time, used on startup and after resume
+        background - dont block the caller while the tcp and tls handshake happens
+        '''
+        future = self.client.warm_up()
+        return future if background else future.result()
+
+    def pool_stats(self):
+        return self.client.pool_stats()
+
+    def cache_stats(self):
+        return self.client.cache_stats()
+
+    def clear_cache(self):
+        self.client.clear_cache()
+
+    def close(self):
+        self.outbox.close() #whatever is left stays in the journal for next time
+        self.client.close()
 
 class HarvestStatus(Harvest):
     def __init__(self):
-        self.harvest = Harvest("", "", "").status()
+        harvest = Harvest("", "", "")
+        self.harvest = harvest.status()
+        harvest.close()
 
     def get(self):
         return self.harvest['status']
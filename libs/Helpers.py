@@ -1,4 +1,5 @@
 import os, sys
+from hashlib import md5
 
 class _Path(object):
     '''
@@ -32,3 +33,10 @@ def get_libs_path( libs_path='.', path=None, idx=0 ):
         path - abs path of __file__
     '''
     _Path._insert_libs_path('%s/%s' % ( _Path._get_path(path), libs_path), idx)
+
+def account_filename( config_path, uri, username, name ):
+    '''path of a file kept per account, queued time and cached entries must never show under somebody else's login
+        config_path - directory of the config files
+        name - what is kept, eg. "outbox-%s.journal", gets the account's hash
+    '''
+    return '%s%s' % (config_path, name % md5('%s %s' % (uri, username)).hexdigest())
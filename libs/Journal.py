@@ -0,0 +1,45 @@
+'''
+append-only journals of json lines, the timer and the outbox keep their state in them
+
+>>> import Journal
+>>> Journal.append("data/config/timer.journal", {"seq": 1, "event": "start"}) #on disk once it returns
+>>> list(Journal.read("data/config/timer.journal")) #a line torn by a crash is skipped
+[{u'seq': 1, u'event': u'start'}]
+>>> Journal.rewrite("data/config/timer.journal", [snapshot]) #atomically, eg. compacted to one snapshot
+'''
+
+import os
+import json
+
+def append(path, record):
+    journal = open(path, 'a')
+    try:
+        journal.write("%s\n" % json.dumps(record))
+        journal.flush()
+        os.fsync(journal.fileno())
+    finally:
+        journal.close()
+
+def read(path):
+    '''
+    yields the records of path, nothing when it does not exist
+    '''
+    if not os.path.exists(path):
+        return
+    for line in open(path):
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue #torn write from a crash, it was never confirmed to the caller
+
+def rewrite(path, records):
+    '''
+    replace the journal with records, a crash leaves either the old one or the new one
+    '''
+    temp = "%s.tmp" % path
+    with open(temp, 'w') as journal:
+        for record in records:
+            journal.write("%s\n" % json.dumps(record))
+        journal.flush()
+        os.fsync(journal.fileno())
+    os.rename(temp, path)
@@ -0,0 +1,79 @@
+'''
+time worked on each entry in whole seconds, only turned into hours when it is sent to harvest
+
+every change used to be rounded to hundredths of an hour on its own and added to hours that were
+already rounded, so each switch could gain or lose up to 18 seconds and it added up over a day.
+the ledger keeps the exact seconds, the remainder of one rounding is carried into the next
+
+>>> import Ledger
+>>> ledger = Ledger.Ledger()
+>>> ledger.add("42", 1188, hours=1.5) #an interval of 0.33 hours on an entry harvest has at 1.5 hours
+1.83
+>>> ledger.add("42", -688) #stopped 500 seconds in, the rest of the interval is taken back
+1.64
+>>> ledger.sync("42", 1.64) #harvest's hours, taken over only when somebody else changed them
+False
+>>> ledger.drift() #seconds between the exact time and what rounding every change would have sent
+4
+'''
+
+class Ledger(object):
+    def __init__(self):
+        self._seconds = {} #entry id -> seconds worked
+        self._naive = {} #entry id -> hours as rounding every change on its own would have them
+        self.adopted = 0 #times harvest had hours we did not send
+
+    def sync(self, entry_id, hours):
+        '''
+        take harvest's hours for entry_id unless they are the ones we sent, eg. they were edited on the web app
+        '''
+        entry_id = str(entry_id)
+        hours = round(float(hours or 0), 2)
+        if entry_id in self._seconds and self.hours(entry_id) == hours:
+            return False
+        if entry_id in self._seconds:
+            self.adopted += 1
+        self._seconds[entry_id] = int(round(hours * 3600))
+        self._naive[entry_id] = hours
+        return True
+
+    def add(self, entry_id, seconds, hours = None):
+        '''
+        seconds worked on entry_id, negative to take back time that was not worked.
+        returns the hours to send for it
+        hours - what harvest has for entry_id, used when the ledger has not seen it yet
+        '''
+        entry_id = str(entry_id)
+        if entry_id not in self._seconds:
+            self.sync(entry_id, hours)
+        self._seconds[entry_id] = max(0, self._seconds[entry_id] + int(round(seconds)))
+        self._naive[entry_id] = max(0, round(self._naive[entry_id] + round(seconds / 3600.0, 2), 2))
+        return self.hours(entry_id)
+
+    def hours(self, entry_id):
+        '''
+        hours of entry_id at harvest's precision, the only place seconds become hours
+        '''
+        return round(self._seconds.get(str(entry_id), 0) / 3600.0, 2)
+
+    def seconds(self, entry_id):
+        return self._seconds.get(str(entry_id), 0)
+
+    def rename(self, old_id, new_id):
+        '''
+        an add harvest answered, the seconds it was given under its local id carry over to harvest's id
+        '''
+        old_id, new_id = str(old_id), str(new_id)
+        if old_id in self._seconds:
+            self._seconds[new_id] = self._seconds.pop(old_id)
+            self._naive[new_id] = self._naive.pop(old_id)
+
+    def drift(self):
+        '''
+        seconds the ledger kept from being lost or made up, over every entry it has
+        '''
+        return int(round(sum(abs(self._naive[id] * 3600 - self._seconds[id]) for id in self._seconds)))
+
+    def stats(self):
+        return {'entries': len(self._seconds), 'seconds': sum(self._seconds.values()), 'drift': self.drift(),
+                'adopted': self.adopted}
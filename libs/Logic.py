@@ -1,11 +1,9 @@
 import os, sys, math
+import logging
 import gtk, gobject
-from time import time, sleep, mktime
+from time import time, sleep
 import string
-
-import pytz
-from dateutil.parser import parse
-from dateutil.tz import tzoffset
+from uuid import uuid4
 
 from base64 import b64encode
 import ConfigParser
@@ -14,8 +12,16 @@ if sys.platform != 'win32':
 
     from gnomekeyring import IOError as KeyRingError
 
-from datetime import datetime, timedelta
-from Harvest import Harvest, HarvestError, HarvestStatus
+from datetime import datetime, date
+from Store import Store, StoreError, catalog_fingerprint
+from Models import Entry, Project, Catalog
+from Timesheet import Timesheet, totals
+from Notes import Timelines, STARTED, STOPPED, SWITCH_TO
+from Dispatcher import Dispatcher, TODAY
+import Timer
+import Clock
+from Ledger import Ledger
+from Harvest import Harvest, HarvestError, HarvestConnectionError, HarvestCancelled
 
 if sys.platform != "win32":
     from Notifier import Notifier
@@ -44,10 +50,11 @@ from data import PathConfig
 
 media_path = "%s../%s" % (libs_path, PathConfig.media_path_dir)
 config_path = "%s../%s" % (libs_path, PathConfig.config_path_dir)
+log = logging.getLogger(__name__)
 
 path = os.path.dirname(os.path.abspath(__file__))
 
-from libs.Helpers import get_libs_path
+from libs.Helpers import get_libs_path, account_filename
 from data import PathConfig as data_config
 
 get_libs_path(data_config.libs_path_dir, path)
@@ -104,8 +111,10 @@ class logicFunctions(logicHelpers):
         #statusIcon
         self.icon = None #timetracker icon instance
 
-        #timer state
-        self.running = False #timer is running and tracking time
+        #timer state, running, away from desk and the interval dialog follow from it
+        self.clock = Clock.Clock() #all timing, never stepped by ntp and knows harvest's time and when we slept
+        self.timer = Timer.Timer(clock=self.clock) #replaced by the one journaled for the account on connect
+        self.ledger = Ledger() #seconds worked on each entry, hours are only rounded when sent
 
         #timeout instances
         self.interval_timer_timeout_instance = None #gint of the timeout_add for interval
@@ -119,6 +128,18 @@ class logicFunctions(logicHelpers):
 
         #harvest instance, crud
         self.harvest = None #harvest instance
+        #harvest and store calls run here, off the main loop. TODAY orders everything touching today's entries
+        self.dispatcher = Dispatcher(gobject.idle_add, on_busy=self.set_busy)
+        self.store = None #local copy of what harvest sent, the ui reads from it
+        self.user_id = None #harvest id of the logged in user, asked for on the first delta sync
+        self.timesheet = None #week view, past days come from the store
+        self.timesheet_day = None #a day of the week shown in the timesheet window
+
+        #delta sync, refreshes only ask for entries changed since the last one
+        self.delta_sync = True
+        self.full_sync_every = 600 #seconds, deletions and catalog changes only come with a full daily document
+        self.watermark_margin = 120 #seconds the watermark is set back, updated_since only has minutes
+        self.last_full_sync = 0
 
         self.interval = 0.33 #default 20 minute interval
         self.show_countdown = False
@@ -126,23 +147,23 @@ class logicFunctions(logicHelpers):
         self.show_timetracker = True
         self.show_notification = True
 
-        self.projects = [] #list of projects, used in comboboxes
-        self.tasks = [] #list of tasks per project, under project index, for comboboxes
+        self.projects = {} #project id -> Project with its tasks, used in comboboxes
+        self.catalog = Catalog(self.projects) #row order of the comboboxes, id <-> row both ways
+        self.collate_catalog = True #sort projects and tasks the way the user's locale does
+        self.catalog_fingerprint = None #of the catalog projects was built from
+        self.shown_selection = None #project and task id the comboboxes show
+        self.catalog_stats = {'rebuilt': 0, 'reused': 0} #refreshes that rebuilt the catalog and those that skipped it
+        self.timelines = Timelines() #parsed notes of each entry, extended with the lines added since the last refresh
 
         self.today_total_hours = 0 #total hours today
 
-        self.away_from_desk = False #used to start stop interval timer and display away popup menu item
         self.always_on_top = False #keep timetracker iwndow always on top
 
         self.attention = None #state/message to set attention icon
 
-        self.interval_dialog_showing = False # whether or not the interval diloag is being displayed
-
-        self.current_entry_id = None #when running this will be set to the current active entry id
-
-        self.current_created_at = None #holds the current task created at date for showing in statusbar
-
-        self.current_hours = 0 #when running this will increment with amount of current hours to post to harvest
+        self.today = None #daily document on screen, changes are applied to it before harvest has them
+        self.current = None #Entry of the running timer
+        self.last = None #Entry as it was sent when the timer was last stopped or the interval dialog came up
 
         self.current_selected_project_id = None #used for current selection of combobox for project, value
         self.current_selected_task_id = None #used for current selected combobox task item, value
@@ -154,13 +175,19 @@ class logicFunctions(logicHelpers):
         self.task_combobox_handler = None
         self.config_filename = kwargs.get('config', '%sharvest.cfg' % config_path) #load config from the data/config/ by default
 
-    def toggle_current_timer(self, id):
-        self.away_from_desk = False
-        self.harvest.toggle_timer(id)
-        self.set_entries()
+    @property
+    def running(self):
+        '''
+        timer is running and tracking time, away from desk included
+        '''
+        return self.timer.running
 
-        if not self.running:
-            self.statusbar.push(0, "Stopped")
+    @property
+    def away_from_desk(self):
+        '''
+        used to start stop interval timer and display away popup menu item
+        '''
+        return self.timer.away
 
     def start_elapsed_timer(self):
         if self.elapsed_timer_timeout_instance:
@@ -177,71 +204,110 @@ class logicFunctions(logicHelpers):
         gobject.timeout_add(1000, self._elapsed_timer)
 
     def _process_elapsed_timer(self):
+        gap = self.clock.tick()
+        if self.harvest and gap:
+            self.harvest.warm_up() #connections are dead after a suspend, reopen before the next real call
+            self.harvest.outbox.kick() #network is likely back, dont wait out the backoff
+            self._resumed(gap)
+
         self.set_status_icon()
         self._update_status()
         self._set_counter_label()
         if self.harvest:
-            if self.current_updated_at and mktime(datetime.utcnow().timetuple()) > self.current_updated_at + self._interval:
-                if self.running and not self.away_from_desk and not self.interval_dialog_showing:
-                    self.running = False
-                    self.last_hours = self.current_hours
-                    self.last_entry_id = self.current_entry_id
-                    self.last_project_id = self.current_project_id
-                    self.last_task_id = self.current_task_id
-                    self.last_text = self.current_text
-                    self.last_notes = self.current_notes
-                    self.call_notify("TimeTracker", "Are you still working on?\n%s" % self.current_text)
+            if self.timer.expired(self._interval):
+                if not self.away_from_desk:
+                    self.timer.expire()
+                    self.last = self.current
+                    self.call_notify("TimeTracker", "Are you still working on?\n%s" % self.working_on())
                     self.interval_dialog_instance = self.interval_dialog("Are you still working on this task?")
-                elif self.running and self.away_from_desk and not self.interval_dialog_showing:
-                    #keep the meter running
-                    self.harvest.update(self.current_entry_id, {#append to existing timer
-                          'notes': self.get_notes(self.current_notes),
-                          'hours': round(float(self.current_hours) + float(self.interval), 2),
-                          'project_id': self.current_project_id,
-                          'task_id': self.current_task_id
-                    })
+                else:
+                    #keep the meter running, append to existing timer
+                    if self.current:
+                        self.current = self.current.copy(notes=self.get_notes(self.current.notes),
+                                                         hours=self.ledger.add(self.current.id, self._interval,
+                                                                               self.current.hours))
+                        self.timer.extend(write=self._update(self.current))
+                        self.apply_locally(self.current)
+                    else:
+                        self.timer.extend()
                     self.set_entries()
 
                 self.refresh_and_show()
 
 
+    def _resumed(self, gap):
+        '''
+        the main loop stood still gap seconds while timing, eg. the machine slept. the gap policy says what
+        the time counts as, the user said it counts already when they went away from desk
+        '''
+        if not self.running or not self.current:
+            return
+        policy = Clock.AWAY if self.away_from_desk else self.clock.policy
+        if policy == Clock.PROMPT and gap < 60:
+            policy = Clock.DISCARD #too short to ask about, it just does not count
+        if policy == Clock.DISCARD:
+            self.timer.skip(gap) #the interval picks up where it stood
+        elif policy == Clock.AWAY:
+            overrun = self.timer.overrun(self._interval) #the interval on the entry has its start covered
+            if overrun:
+                self.current = self.current.copy(hours=self.ledger.add(self.current.id, overrun, self.current.hours))
+                self.timer.away_from_desk(write=self._update(self.current))
+                self.apply_locally(self.current)
+            else:
+                self.timer.away_from_desk()
+        else:
+            self.timer.expire()
+            self.last = self.current
+            message = "Away for %s minutes, are you still working on this task?" % int(gap / 60)
+            self.call_notify("TimeTracker", "%s\n%s" % (message, self.working_on()))
+            self.interval_dialog_instance = self.interval_dialog(message)
+
     def _update_status(self):
         if self.harvest:
             if self.away_from_desk:
                 status = "AWAY: "
             else:
                 status = ""
-            status += "%s for %s" %(self.current_task, self.current_project) if self.running else "Stopped"
+            status += "%s for %s" %(self.current.task, self.current.project_label) if self.running and self.current \
+                else "Working" if self.running else "Stopped"
         else:
             status = "Not Connected"
 
         self.statusbar.push(0, "%s" % status)
 
+    def working_on(self):
+        return self.current.text if self.current else "the task you started"
+
     def _set_counter_label(self):
         if self.harvest:
+            pending = self.harvest.pending()
             self.counter_label.set_text(
-                "%s Entries %0.02f hours Total" % (self.entries_count, self.today_total_hours))
+                "%s Entries %0.02f hours Total%s" % (self.entries_count, self.today_total_hours,
+                                                     ", %s Unsent" % pending if pending else ""))
         else:
             self.counter_label.set_text("")
 
-    def get_notes(self, old_notes = None, get_text = True, append_note = "", start = False):
+    def get_notes(self, old_notes = None, get_text = True, append_note = "", start = False, text = None):
         '''
         get_notes
         old_notes - notes to prepend to notes found in textview
         append_note - append note to notes, used to leave action in timer notes, eg. stopped timer
+        text - use it instead of what the textview has now, it was read before harvest was asked
         '''
         notes = old_notes if old_notes else "" #sanitize None
 
         current_time = datetime.time(datetime.now()).strftime("%H:%M:%S") #for prepending to note
 
-        if get_text:
-            note = self.get_textview_text(self.notes_textview)
-        else:
+        if not get_text:
             note = ""
+        elif text is not None:
+            note = text
+        else:
+            note = self.get_textview_text(self.notes_textview)
 
         if note and note.strip("\n") != "":#prepend time to note if new note not empty
             if start:
-                note = "%s: %s #TimerStarted" % (current_time, note)
+                note = "%s: %s %s" % (current_time, note, STARTED)
             else:
                 note = "%s: %s" % (current_time, note)
 
@@ -257,6 +323,96 @@ class logicFunctions(logicHelpers):
 
         return notes.strip("\n")
 
+    def set_busy(self, busy):
+        '''
+        dispatcher callback, spins while anything is waiting on harvest or the store
+        '''
+        if busy:
+            self.busy_spinner.show()
+            self.busy_spinner.start()
+        else:
+            self.busy_spinner.stop()
+            self.busy_spinner.hide()
+
+    def _update(self, entry):
+        '''
+        the outbox write of entry's notes and hours, journaled with the timer event it goes with
+        '''
+        return {'op': 'update', 'entry_id': entry.id, 'data': entry.update_data()}
+
+    def _queue(self, write, cause):
+        '''
+        queue a write the timer journaled, returns its outbox seq. when it cant be queued the timer
+        still has it and sends it again on the next start
+        '''
+        try:
+            return self.harvest.outbox.queue(write, cause)['seq']
+        except (HarvestError, IOError, OSError) as e:
+            self._send_failed(e)
+
+    def send(self, mutation, *args):
+        '''
+        journal a harvest mutation right away, it is only a local fsync and the outbox thread does the
+        sending. once this returns a quit or a crash cant lose it, so it never waits behind a refresh
+        '''
+        try:
+            return mutation(*args)
+        except (HarvestError, IOError, OSError) as e:
+            self._send_failed(e)
+
+    def _send_failed(self, e):
+        self.attention = "Unable to Queue Change: %s" % e
+        self.set_message_text("Unable to Queue Change\r\n%s" % e)
+        self.set_entries() #nothing was queued, show what harvest and the outbox really have
+
+    def apply_locally(self, entry):
+        '''
+        show a change to entry right away, before harvest has it. the next refresh renders harvest's answer
+        with whatever is still queued on top, so it either confirms the change or drops it
+        '''
+        if self.today is None:
+            return
+        entries = [e for e in self.today['day_entries'] if str(e.get('id')) != entry.id]
+        updated_at = datetime.utcfromtimestamp(self.clock.server_time()).strftime("%Y-%m-%dT%H:%M:%SZ")
+        entries.append(entry.copy(updated_at=updated_at).to_json())
+        self.today = dict(self.today, day_entries=entries)
+        self._setup_current_data(self.today)
+        self._update_status()
+        self.set_status_icon()
+        self._set_counter_label()
+
+    def _posted(self, op):
+        '''
+        outbox callback, the entry an add was shown under locally gets its harvest id with a refresh
+        '''
+        if op['op'] == 'add':
+            if op.get('harvest_id'):
+                self.ledger.rename(op.get('local_id'), op['harvest_id']) #keep the seconds rounding took off
+            self.set_entries()
+        return False #run once
+
+    def _rejected(self, op, e):
+        '''
+        outbox callback, harvest refused a change we already showed, undo it by showing what harvest has.
+        a refused add the timer is on stops the timer too
+        '''
+        self.last_full_sync = 0 #the store may have kept the rejected change, take the whole day again
+        if op['op'] == 'add' and self.timer.state in Timer.ON and self.timer.entry_id == op.get('local_id'):
+            #the entry being timed never made it to harvest, nothing is left to time or ask about
+            self.timer.stop()
+            if self.interval_dialog_instance:
+                self.interval_dialog_instance.hide()
+            self.current = None
+            self._update_status()
+            self.set_status_icon()
+            self._set_counter_label()
+        self.attention = "Harvest Rejected a Change: %s" % e
+        self.set_message_text("Harvest rejected a change, it was undone\r\n%s" % e)
+        self.statusbar.push(0, "Harvest rejected a change, it was undone")
+        self.call_notify("TimeTracker", "Harvest rejected a change, it was undone\n%s" % e)
+        self.set_entries()
+        return False #run once
+
     def set_prefs(self):
         if self.interval:
             self.interval_entry.set_text("%s" % self.interval)
@@ -329,13 +485,13 @@ class logicFunctions(logicHelpers):
                     self.icon = gtk.status_icon_new_from_file(media_path + "away.svg")
                 else:
                     self.icon.set_from_file(media_path + "away.svg")
-                self.icon.set_tooltip("AWAY: Working on %s" % self.current_text)
+                self.icon.set_tooltip("AWAY: Working on %s" % self.working_on())
             else:
                 if not self.icon:
                     self.icon = gtk.status_icon_new_from_file(media_path + "working.svg")
                 else:
                     self.icon.set_from_file(media_path + "working.svg")
-                self.icon.set_tooltip("Working on %s" % self.current_text)
+                self.icon.set_tooltip("Working on %s" % self.working_on())
         else:
             if not self.icon:
                 self.icon = gtk.status_icon_new_from_file(media_path + "idle.svg")
@@ -399,6 +555,14 @@ class logicFunctions(logicHelpers):
         else:
             self.show_timetracker = self.string_to_bool(self.config.get('prefs', 'show_timetracker'))
 
+        if not self.config.has_option('prefs', 'gap_policy'):
+            is_new = True
+            self.config.set('prefs', 'gap_policy', Clock.PROMPT)
+        else:
+            self.clock.policy = self.config.get('prefs', 'gap_policy')
+            if self.clock.policy not in Clock.POLICIES:
+                self.clock.policy = Clock.PROMPT
+
         if not self.config.has_option('prefs', 'always_on_top'):
             is_new = True
             self.config.set('prefs', 'always_on_top', 'False')
@@ -412,6 +576,18 @@ class logicFunctions(logicHelpers):
             #write file in case write not exists or options missing
             self.config.write(open(self.config_filename, 'w'))
 
+    def get_account_filename(self, name):
+        return account_filename(config_path, self.uri, self.username, name)
+
+    def get_outbox_filename(self):
+        return self.get_account_filename("outbox-%s.journal")
+
+    def get_timer_filename(self):
+        return self.get_account_filename("timer-%s.journal")
+
+    def get_store_filename(self):
+        return self.get_account_filename("store-%s.sqlite")
+
     def save_config(self):
         if self.interval <=0 or self.interval == '':
             self.interval = 0.33
@@ -423,6 +599,7 @@ class logicFunctions(logicHelpers):
         self.config.set('prefs', 'show_notification', self.bool_to_string(self.show_notification))
         self.config.set('prefs', 'show_timetracker', self.bool_to_string(self.show_timetracker))
         self.config.set('prefs', 'save_passwords', self.bool_to_string(self.save_passwords))
+        self.config.set('prefs', 'gap_policy', self.clock.policy)
 
         self.save_password()
 
@@ -504,6 +681,15 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
 
     def quit_gracefully(self): #after all those callbacks and stuff, this function works like a charm, successfully injected interrupts
         print 'quitting'
+        if self.harvest:
+            self.harvest.flush(5) #anything still unsent stays in the journal for next start
+            log.debug('harvest writes %(queued)s queued, %(posted)s posted, %(collapsed)s collapsed', self.harvest.write_stats())
+        log.debug('catalog %(rebuilt)s rebuilt, %(reused)s reused', self.catalog_stats)
+        log.debug('timer %(state)s, %(events)s events, %(synced)s taken from harvest', self.timer.stats())
+        log.debug('ledger %(entries)s entries, %(drift)s seconds of rounding drift corrected', self.ledger.stats())
+        log.debug('clock %(offset)ss behind harvest, %(gaps)s gaps of %(gap_seconds)ss counted as %(policy)s, '
+                  '%(stepped)ss of wall clock steps ignored', self.clock.stats())
+        log.debug('dispatcher %(ran)s ran, %(failed)s failed, %(waited)s waited their turn', self.dispatcher.stats())
 
     def _run_application(self):
         #print 'logic _run_application'
@@ -527,27 +713,35 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
         return self
 
     def check_harvest_up(self):
-        #print 'checking harvest up'
-        if HarvestStatus().get() == "down":
-            self.warning_message(self.timetracker_window, "Harvest Is Down")
+        '''
+        no round trip of its own, harvest status is only asked when the circuit breaker trips
+        '''
+        if self.harvest and self.harvest.is_down():
             self.attention = "Harvest is Down!"
-            return self.not_connected()
+            return False
         return True
 
-    def refresh_comboboxes(self):
-        if self.project_combobox_handler:
-            self.project_combobox.handler_block(self.project_combobox_handler)
+    def refresh_comboboxes(self, projects = True):
+        '''
+        projects - rebuild the project liststore too, not needed while the catalog is unchanged
+        '''
+        if projects:
+            if self.project_combobox_handler:
+                self.project_combobox.handler_block(self.project_combobox_handler)
 
-        self.create_liststore(self.project_combobox, self.projects, self.current_selected_project_idx)
+            self.create_liststore(self.project_combobox, self.projects, self.current_selected_project_idx,
+                                  order=self.catalog.order)
 
-        if self.project_combobox_handler:
-            self.project_combobox.handler_unblock(self.project_combobox_handler)
+            if self.project_combobox_handler:
+                self.project_combobox.handler_unblock(self.project_combobox_handler)
 
         #repopulate the tasks comboboxes, because they can be different for each project
         if self.current_selected_project_id and self.current_selected_task_idx > -1:
             if self.task_combobox_handler:
                 self.task_combobox.handler_block(self.task_combobox_handler)
-            self.create_liststore(self.task_combobox, self.tasks[self.current_selected_project_id], self.current_selected_task_idx)
+            self.create_liststore(self.task_combobox, self.projects[self.current_selected_project_id].tasks,
+                                  self.current_selected_task_idx,
+                                  order=self.catalog.task_order(self.current_selected_project_id))
             if self.task_combobox_handler:
                 self.task_combobox.handler_unblock(self.task_combobox_handler)
 
@@ -559,8 +753,19 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
                 self.task_combobox.handler_unblock(self.task_combobox_handler)
 
 
-        self.set_comboboxes(self.project_combobox, self.current_selected_project_id)
-        self.set_comboboxes(self.task_combobox, self.current_selected_task_id)
+        #rows straight from the catalog, they are the rows create_liststore made
+        if self.project_combobox_handler:
+            self.project_combobox.handler_block(self.project_combobox_handler)
+        self.project_combobox.set_active(self.catalog.project_row(self.current_selected_project_id))
+        if self.project_combobox_handler:
+            self.project_combobox.handler_unblock(self.project_combobox_handler)
+        if self.task_combobox_handler:
+            self.task_combobox.handler_block(self.task_combobox_handler)
+        self.task_combobox.set_active(self.catalog.task_row(self.current_selected_project_id,
+                                                            self.current_selected_task_id))
+        if self.task_combobox_handler:
+            self.task_combobox.handler_unblock(self.task_combobox_handler)
+        self.shown_selection = (self.current_selected_project_id, self.current_selected_task_id)
 
     def not_connected(self):
         self.preferences_window.show()
@@ -579,24 +784,96 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
         if not self.harvest:
             return self.not_connected()
 
+        #a newer refresh cancels this one if it is still waiting on harvest
+        token = self.harvest.supersede('refresh')
+        self.dispatcher.run(self._sync_today, (self.harvest, self.store, token, self.user_id, self.last_full_sync),
+                            done=self._entries_synced, failed=self._entries_failed, key=TODAY)
+
+    def _sync_today(self, harvest, store, token, user_id, last_full_sync):
+        '''
+        on a dispatcher worker, brings the store up to date with harvest and reads today back from it.
+        user_id, last_full_sync - of the account harvest is logged in to, handed in and back so a reconnect never mixes them up
+        returns (harvest, day, daily document, error of the refresh, user_id, when it synced the whole day or None),
+        no widgets in here
+        '''
+        day = date.today().isoformat()
+        data = None
+        error = None
+        full_sync = None
+
         #get data from harvest
-        data = self.harvest.get_today()
+        try:
+            since = harvest.server_time() - self.watermark_margin #anything changed after this comes next time
+            watermark = store.watermark(day)
+            if self.delta_sync and watermark and self.clock.now() - last_full_sync < self.full_sync_every:
+                if user_id is None:
+                    user_id = harvest.who_am_i(token=token)['user']['id']
+                changes = harvest.get_entries(user_id, day, day, watermark, token=token)
+                store.merge_entries(changes, day, since)
+            else:
+                data = harvest.get_today(token=token)
+                day = data.get('for_day', day)
+                store.sync_day(data, day, since)
+                full_sync = self.clock.now()
+        except HarvestCancelled:
+            raise #superseded, the newer refresh sets everything up
+        except HarvestError as e:
+            error = e
+        except StoreError as e:
+            return harvest, day, data, e, user_id, full_sync #the answer is still good, just not kept
+
+        #always render from the store, after a failed refresh it still has the last day we saw
+        try:
+            data = store.get_day(day, catalog=False) #the catalog is only read again when its fingerprint changed
+        except StoreError as e:
+            return harvest, day, None, e, user_id, full_sync
+        if data:
+            harvest.outbox.overlay(data, adds=True) #changes harvest has not taken yet stay on screen
+        return harvest, day, data, error, user_id, full_sync
+
+    def _entries_synced(self, result):
+        harvest, day, data, error, user_id, full_sync = result
+        if harvest is not self.harvest:
+            return #synced for the account before a reconnect
+        self.user_id = user_id
+        if full_sync is not None:
+            self.last_full_sync = full_sync
+        if isinstance(error, HarvestConnectionError): #unreachable or ran past its deadline
+            if self.check_harvest_up():
+                self.attention = "Harvest Unreachable, %s Unsent" % self.harvest.pending()
+            self.set_message_text("Unable to reach Harvest\r\n%s" % error)
+        elif isinstance(error, HarvestError): #throttled or an answer we cant use, try again on the next refresh
+            self.attention = "Harvest Error: %s" % error
+            self.set_message_text("Harvest Error\r\n%s" % error)
+        elif isinstance(error, StoreError):
+            self.attention = "Local Store Error: %s" % error
+
+        if not data:
+            return
 
+        self.today = data
         self._setup_current_data(data)
 
-        self.attention = None #remove attention state, everything should be fine by now
+        if error:
+            return
+        if self.harvest.is_offline():
+            self.attention = "Offline, %s Unsent" % self.harvest.pending()
+        else:
+            self.attention = None #remove attention state, everything should be fine by now
 
         if not self.running:
             self.statusbar.push(0, "Stopped")
 
+    def _entries_failed(self, e):
+        if isinstance(e, HarvestCancelled):
+            return #superseded, the newer refresh sets everything up
+        self.attention = "ERROR: %s" % e
+        self.set_message_text("Error\r\n%s" % e)
+
     def connect_to_harvest(self):
         '''
         connect to harvest and get data, set the current state and save the config
         '''
-        #check harvest status
-        if not self.check_harvest_up():
-            return
-
         #set preference fields data
         self.set_prefs()
 
@@ -604,20 +881,34 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
             self.preferences_window.show()
             self.preferences_window.present()
 
-            self.running = False
             return self.not_connected()
 
         try:
-            self.harvest = Harvest(self.uri, self.username, self.password)
+            if self.harvest:
+                self.harvest.close() #dont leave the old pooled connections lingering
+            if self.store:
+                self.store.close()
+            self.harvest = Harvest(self.uri, self.username, self.password, self.get_outbox_filename(),
+                                   clock=self.clock)
+            self.store = Store(self.get_store_filename())
+            self.timesheet = Timesheet(self.harvest, self.store)
+            #the state is known before harvest answers, writes its events never got to queue are queued now
+            self.timer = Timer.Timer(self.get_timer_filename(), self.clock, self._queue)
+            self.ledger = Ledger()
+            #called on the outbox thread, handed to the main loop
+            self.harvest.outbox.on_posted = lambda op: gobject.idle_add(self._posted, op)
+            self.harvest.outbox.on_rejected = lambda op, e: gobject.idle_add(self._rejected, op, e)
+            self.today = None
+            self.user_id = None
+            self.last_full_sync = 0 #start from a full daily document
+            self.harvest.warm_up()
         except HarvestError as e:
-            self.running = False
             self.attention = "Unable to Connect to Harvest!"
             self.set_message_text("Unable to Connect to Harvest\r\n%s" % e)
             self.warning_message(self.timetracker_window, "Error Connecting!\r\n%s" % e)
             return self.not_connected()
         except Exception as e:
             #catch all other exceptions
-            self.running = False
             self.attention = "ERROR: %s" % e
             self.set_message_text("Error\r\n%s" % e)
             raise e
@@ -632,229 +923,283 @@ class uiLogic(uiBuilder, uiCreator, logicFunctions):
         #all should be fine by now, return true
         return True
 
+    def show_timesheet(self, day = None, force = False):
+        '''
+        show the week of day from the store right away, then refresh the days that need it in the background
+        '''
+        if not self.harvest:
+            return self.not_connected()
+
+        day = self.timesheet_day = day or self.timesheet_day or date.today()
+        self._render_timesheet(self.timesheet.week(day))
+        self.timesheet_window.show()
+        self.timesheet_window.present()
+
+        self.timesheet_statusbar.push(0, "Refreshing")
+        token = self.harvest.supersede('timesheet') #paging through weeks cancels the one before
+        future = self.timesheet.refresh(day, force, token)
+        #done on a harvest worker, hand the answer back to the main loop with the week it was asked for
+        future.add_done_callback(lambda f: gobject.idle_add(self._timesheet_refreshed, f, day))
+
+    def _timesheet_refreshed(self, future, day):
+        if day != self.timesheet_day:
+            return False #the user moved on to another week
+        try:
+            self._render_timesheet(future.result())
+        except StoreError as e:
+            self.timesheet_statusbar.push(0, "Local Store Error: %s" % e)
+            return False
+
+        errors = [error for error in self.timesheet.errors.values() if not isinstance(error, HarvestCancelled)]
+        if errors:
+            self.timesheet_statusbar.push(0, "Unable to refresh %s days\r\n%s" % (len(errors), errors[0]))
+        else:
+            self.timesheet_statusbar.push(0, "Up to date")
+        return False #run once
+
+    def _render_timesheet(self, week):
+        days = [datetime.strptime(d, "%Y-%m-%d") for d, data in week]
+        treeview = self.timesheet_treeview
+        if not treeview.get_columns():
+            for index, title in enumerate(["Project", "Task"] + [d.strftime("%a") for d in days] + ["Total"]):
+                cell = gtk.CellRendererText()
+                if index > 1:
+                    cell.set_property('xalign', 1.0)
+                treeview.append_column(gtk.TreeViewColumn(title, cell, text=index))
+
+        for index, d in enumerate(days):
+            treeview.get_column(index + 2).set_title(d.strftime("%a %d"))
+
+        liststore = gtk.ListStore(*[str] * (len(days) + 3))
+        rows = self.timesheet.rows(week)
+        for project, task, hours, total in rows:
+            liststore.append([project, task] + ["%0.02f" % h if h else "" for h in hours] + ["%0.02f" % total])
+        hours, total = totals(rows, len(days))
+        liststore.append(["Total", ""] + ["%0.02f" % h for h in hours] + ["%0.02f" % total])
+        treeview.set_model(liststore)
+
+        self.timesheet_label.set_text("%s - %s, %0.02f hours" % (days[0].strftime("%b %d"),
+                                                                  days[-1].strftime("%b %d %Y"), total))
+
     def _setup_current_data(self, harvest_data):
         self.entries_count = len(harvest_data['day_entries'])
 
         self.today_total_hours = 0 #total hours amount for all entries combined
         self.today_total_elapsed_hours = 0 #today_total_hours + timedelta
 
-        self.running = False
-
-        self.projects = {}
-        self.tasks = {}
-
-        #all projects, used for liststore for combobox
-        for project in harvest_data['projects']:
-            project_id = str(project['id'])
-            self.projects[project_id] = "%s - %s" % (project['client'], project['name'])
-            self.tasks[project_id] = {}
-            for task in project['tasks']:
-                task_id = str(task['id'])
-                self.tasks[project_id][task_id] = "%s" % task['name']
+        #the store hands out its fingerprint, a document straight from harvest needs hashing
+        fingerprint = harvest_data.get('fingerprint') or catalog_fingerprint(harvest_data['projects'])
+        rebuild = fingerprint != self.catalog_fingerprint
+        if rebuild:
+            self.catalog_stats['rebuilt'] += 1
+            #all projects, used for liststore for combobox
+            if 'projects' in harvest_data:
+                self.projects = Project.catalog(harvest_data['projects'])
+            else:
+                self.projects = self.store.get_projects() #shared with the store, not copied
+            self.catalog = Catalog(self.projects, self.collate_catalog)
+            self.catalog_fingerprint = fingerprint
+        else:
+            self.catalog_stats['reused'] += 1
 
-        _updated_at = None #date used to determine the newest entry to use as last entry, a user could on a diff comp use\
+        newest = None #the newest entry is used as last entry, a user could on a diff comp use\
         # harvest web app and things go out of sync so we should use the newest updated_at entry
 
-        # reset
-        self.current_entry_id = None
-        self.current_hours = ""
-        self.current_project_id = None
-        self.current_task_id = None
-        self.current_created_at = None
-        self.current_updated_at = None
-
-        #get total hours and set current
-        for entry in harvest_data['day_entries']:
+        #get total hours and the newest entry
+        entries = [self._named(Entry.from_json(e)) for e in harvest_data['day_entries']]
+        for entry in entries:
             #how many hours worked today, used in counter label
-            self.today_total_hours += entry['hours']
-
-            #make dates into a datetime object we can use
-            entry['updated_at'] = parse(entry['updated_at'])
-            entry['created_at'] = parse(entry['created_at'])
-
-            #this should all go away, leave for now
-            if not _updated_at:#first time
-                _updated_at = entry['updated_at']
+            self.today_total_hours += entry.hours
+            self.ledger.sync(entry.id, entry.hours) #kept unless changed by somebody else
 
             #use most recent updated at entry
-            if _updated_at <= entry['updated_at']:
-                _updated_at = entry['updated_at']
-                _updated_at_time = mktime(entry['updated_at'].timetuple())
-
-                stopped = False
-
-                last_line = entry["notes"].split("\n")[-1] if entry.has_key("notes") and entry['notes'] else ""
-
-                if last_line.split(" ")[-1] == "#TimerStopped" or last_line.find("#SwitchTo") > -1:
-                    stopped = True
-
-                if self.is_running(_updated_at_time, stopped):
-                    self.running = True
-
-                    self.current_hours = "%0.02f" % round(entry['hours'], 2)
-                    self.current_notes = entry['notes']
-
-                    self.current_updated_at = _updated_at_time
-
-                    entry_id = str(entry['id'])
-                    project_id = str(entry['project_id'])
-                    task_id = str(entry['task_id'])
-
-                    self.current_entry_id = entry_id
+            if not newest or newest.updated <= entry.updated:
+                newest = entry
+
+        if newest:
+            #harvest only has a say when it changed after our own last event
+            if self.timelines.get(newest.id, newest.notes).stopped:
+                state = Timer.STOPPED
+            elif self.is_running(newest.updated_time):
+                state = Timer.RUNNING
+            else:
+                state = None #ran out without a word, the timer asks the user about that itself
+            self.timer.sync(newest.id, newest.project_id, newest.task_id, self.clock.local(newest.updated_time),
+                            state)
 
-                    self.current_project = self.projects[project_id]
-                    self.current_selected_project_id = project_id
-                    self.current_selected_project_idx = self.projects.keys().index(
-                        project_id) + 1 #compensate for empty 'select one'
+        self.current = self._timed_entry(entries)
+        if self.running:
+            self.current_selected_project_id = self.timer.project_id
+            self.current_selected_project_idx = self.catalog.project_row(self.timer.project_id)
 
-                    self.current_selected_task_id = task_id
-                    self.current_selected_task_idx = self.tasks[project_id].keys().index(
-                        task_id) + 1 #compensate for empty 'select one'
-                    self.current_task = self.tasks[project_id][task_id]
+            self.current_selected_task_id = self.timer.task_id
+            self.current_selected_task_idx = self.catalog.task_row(self.timer.project_id, self.timer.task_id)
 
-                    self.current_created_at = entry['created_at'] #set created at date for use in statusbar, as of now
+        if rebuild:
+            self.refresh_comboboxes() #setup the comboboxes
+        elif self.shown_selection != (self.current_selected_project_id, self.current_selected_task_id):
+            self.refresh_comboboxes(False) #same catalog, only the selection moved
 
-                    self.current_text = "%s %s %s" % (entry['hours'], entry['task'], entry['project']) #make the text
+    def _timed_entry(self, entries):
+        '''
+        the entry the timer is on, also when it was started under the local id of an add harvest since answered
+        '''
+        if self.timer.state not in Timer.ON:
+            return None
+        ids = [self.timer.entry_id]
+        if self.harvest:
+            ids.append(str(self.harvest.outbox.harvest_id(self.timer.entry_id)))
+        for entry in entries:
+            if entry.id in ids:
+                return entry
+        for entry in reversed(entries): #added in an earlier session, the id it was started under is gone
+            if (entry.project_id, entry.task_id) == (self.timer.project_id, self.timer.task_id):
+                return entry
+        return None
+
+    def _named(self, entry):
+        '''
+        adds still in the outbox only have ids, name their project and task from the catalog
+        '''
+        if entry.project is None and entry.project_id in self.projects:
+            project = self.projects[entry.project_id]
+            task = project.tasks.get(entry.task_id)
+            return entry.copy(client=project.client, project=project.name, task=task.name if task else None)
+        return entry
 
-        self.refresh_comboboxes() #setup the comboboxes
     def is_running(self, timestamp, stopped = False):
+        '''
+        timestamp - harvest's updated_at of an entry, an interval from it has not run out on harvest's clock
+        '''
         if timestamp:
-            if int(timestamp + self._interval) > int(mktime(datetime.utcnow().timetuple())):
+            if int(timestamp + self._interval) > int(self.clock.server_time()):
                 if not stopped:
                     return True
 
         return False
 
-    def _get_elapsed_time_diff(self, timestamp):
-        if timestamp:
-            if float(timestamp + self._interval) > float(mktime(datetime.utcnow().timetuple())):
-                return float(timestamp + self._interval) - float(mktime(datetime.utcnow().timetuple()))
-        return False
-
     def stop_and_refactor_time(self, task_type = ""):
-        if self.is_running(self.current_updated_at):
-            #TODO: figure out how to keep track on lost seconds and add them up them auto correct,
-            #also handle(when dialog yes response) the time when interval dialog is showing and the timer is actually stopped
-            secs = self._get_elapsed_time_diff(self.current_updated_at) #seconds left to run this timer
-            interval = round(float(self.interval) * (secs / self._interval),2) # interval to subract from already alloted time
-
-            self.running = False
-            self.last_project_id = self.current_project_id
-            self.last_task_id = self.current_task_id
+        if self.current and self.running:
+            #TODO: handle(when dialog yes response) the time when interval dialog is showing and the timer is actually stopped
+            secs = self.timer.left(self._interval) #seconds left to run this timer, taken back from the entry
 
             if task_type != "":
-                self.last_notes = self.get_notes(self.current_notes, False, "%s"%task_type) # task switched
+                notes = self.get_notes(self.current.notes, False, "%s"%task_type) # task switched
             else:
-                self.last_notes = self.get_notes(self.current_notes, True, "#TimerStopped") #timer stopped
-                
-            self.last_hours = "%0.02f" % round(float(self.current_hours) - float(interval), 2)
-            self.last_text = self.current_text
-            self.last_entry_id = self.current_entry_id
-            #print self.last_hours
-            entry = self.harvest.update(self.last_entry_id, {#append to existing timer
-                'notes': self.last_notes,
-                'hours': self.last_hours,
-                'project_id': self.last_project_id,
-                'task_id': self.last_task_id
-            })
-            #print entry
+                notes = self.get_notes(self.current.notes, True, STOPPED) #timer stopped
+
+            self.last = self.current.copy(notes=notes, hours=self.ledger.add(self.current.id, -secs, self.current.hours))
+            #print self.last.hours
+            self.timer.stop(write=self._update(self.last)) #append to existing timer
+            self.apply_locally(self.last) #stopped on screen now, the refresh confirms it
             self.set_entries()
 
     def append_add_entry(self):
         if self.harvest: #we have to be connected
             if self.current_selected_project_id and self.current_selected_task_id:
-                if self.get_textview_text(self.notes_textview).strip("\n") == "":
+                text = self.get_textview_text(self.notes_textview)
+                if text.strip("\n") == "":
                     return #Fail early, notes cannot be empty to send anything
 
-                data = self.harvest.get_today()
-                if not 'day_entries' in data:# this should never happen, but just in case lets check
-                    self.attention = "Unable to Get data from Harvest"
-                    self.set_message_text("Unable to Get data from Harvest")
-                    return
-
-                if self.running:
-                    got_one = False
-                    for entry in data['day_entries']:
-                        if (entry['project_id'] == self.current_selected_project_id\
-                            and entry['task_id'] == self.current_selected_task_id)\
-                            and self.current_hours: #current running time with timedelta added from timer
-                            #print 'running and exists', self.current_hours, self.last_hours
-
-                            task = self.tasks[self.current_selected_project_id][self.current_selected_task_id]
-                            self.stop_and_refactor_time(
-                                "#SwitchTo %s " % task) #refactor any previous time alloted to a task
-                            print 'running and exists', entry['hours'], self.current_hours, self.last_hours
-
-
-                            if str(entry['id']) != str(self.last_entry_id): #dont increment timer if only append note to current timer
-                                hours = round(float(entry['hours']) + float(self.interval), 2) #task switched
-                                notes = self.get_notes(entry['notes'], True, "", True)
-                            else:
-                                hours = round(float(entry['hours']), 2) # same task as before, since interval timer running no need to increment time again
-                                notes = self.get_notes(entry['notes'])
-
-                            entry = self.harvest.update(entry['id'], {#append to existing timer
-                                 'notes': notes,
-                                 'hours': hours,
-                                 'project_id': self.current_selected_project_id,
-                                 'task_id': self.current_selected_task_id
-                            })
-                            #print entry
-                            got_one = True
-                            break
-
-                    if not got_one:
-                        #not the same project task as last one, add new entry
-                        print 'running and doesnt exist'
-                        project_id = self.get_combobox_selection(self.project_combobox)
-                        task_id = self.get_combobox_selection(self.task_combobox)
-                        task = self.tasks[project_id][task_id]
-                        notes = self.get_notes(None, True, "", True), #TimerStarted
-                        self.stop_and_refactor_time("#SwitchTo %s "%task) #refactor any previous time alloted to a task
-                        entry = self.harvest.add({
-                            'notes': notes,
-                            'hours': self.interval,
-                            'project_id': project_id,
-                            'task_id': task_id
-                        })
-                        #print entry
-                    if 'timer_started_at' in entry and 'id' in entry: #stop the timer if adding it has started it
-                        self.harvest.toggle_timer(entry['id'])
-                else:
-                    got_one = False
-                    for entry in data['day_entries']:
-                        if (entry['project_id'] == self.current_selected_project_id\
-                            and entry['task_id'] == self.current_selected_task_id): #found existing project/task entry for today, just append to it
-                            #self.harvest.toggle_timer(entry['id'])
-                            print 'not running and exists'
-
-                            entry = self.harvest.update(entry['id'], {#append to existing timer
-                                 'notes': self.get_notes(entry['notes'], True, "", True),
-                                 'hours': round(float(entry['hours']) + float(self.interval), 2),
-                                 'project_id': self.current_selected_project_id,
-                                 'task_id': self.current_selected_task_id
-                            })
-                            #print entry
-                            got_one = True
-                            break
-
-                    if not got_one:
-                        #not the same project task as last one, add new entry
-                        print 'not running and doesnt exist'
-                        entry = self.harvest.add({
-                            'notes': self.get_notes(None, True, "", True), #TimerStarted
-                            'hours': self.interval,
-                            'project_id': self.current_selected_project_id,
-                            'task_id': self.current_selected_task_id
-                        })
-                        #print entry
-                    if 'timer_started_at' in entry and 'id' in entry: #stop the timer if it was started by harvest, do timing locally
-                        self.harvest.toggle_timer(entry['id'])
+                if self.today is not None:
+                    #decided from what is on screen, the writes and their refresh go out in the background
+                    return self._append_add_entry(self.today, text)
 
+                #nothing shown yet, user is waiting on this one, dont queue behind refreshes. the entries are
+                #looked at once harvest answered, the writes go ahead of anything asked meanwhile
+                self.dispatcher.run(self.harvest.get_today, (True,),
+                                    done=lambda data: self._append_add_entry(data, text),
+                                    failed=lambda e: self._append_add_failed(e, text), key=TODAY)
             else:
                 self.statusbar.push(0, "No Project and Task Selected")
                 return False
-            self.set_textview_text(self.notes_textview, "")
-            self.set_entries()
         else: #something is wrong we aren't connected
             return self.not_connected()
+
+    def _append_add_failed(self, e, text):
+        self.attention = "Unable to Get data from Harvest"
+        self.set_message_text("Unable to Get data from Harvest\r\n%s" % e)
+        if self.get_textview_text(self.notes_textview).strip("\n") == "":
+            self.set_textview_text(self.notes_textview, text) #give the note back, nothing was sent
+
+    def _append_add_entry(self, data, text):
+        if not 'day_entries' in data:# this should never happen, but just in case lets check
+            return self._append_add_failed("No entries in the answer", text)
+
+        entries = [Entry.from_json(e) for e in data['day_entries']]
+
+        if self.running:
+            got_one = False
+            for entry in entries:
+                if (entry.project_id == self.current_selected_project_id\
+                    and entry.task_id == self.current_selected_task_id)\
+                    and self.current: #current running time with timedelta added from timer
+                    #print 'running and exists', self.current.hours
+
+                    task = self.projects[self.current_selected_project_id].tasks[self.current_selected_task_id]
+                    self.stop_and_refactor_time(
+                        "%s %s " % (SWITCH_TO, task)) #refactor any previous time alloted to a task
+                    print 'running and exists', entry.hours, self.last.hours if self.last else None
+
+
+                    if not self.last or entry.id != self.last.id: #dont increment timer if only append note to current timer
+                        entry = entry.copy(hours=self.ledger.add(entry.id, self._interval, entry.hours),
+                                           notes=self.get_notes(entry.notes, True, "", True, text)) #task switched
+                    else:
+                        # same task as before, since interval timer running no need to increment time again
+                        #the stop just took the unused interval back in the ledger, entry.hours is from before it
+                        entry = entry.copy(hours=self.ledger.add(entry.id, 0, entry.hours),
+                                           notes=self.get_notes(entry.notes, text=text))
+
+                    #append to existing timer
+                    self.timer.start(entry.id, entry.project_id, entry.task_id, write=self._update(entry))
+                    self.apply_locally(entry)
+                    got_one = True
+                    break
+
+            if not got_one:
+                #not the same project task as last one, add new entry
+                print 'running and doesnt exist'
+                project_id = self.get_combobox_selection(self.project_combobox)
+                task_id = self.get_combobox_selection(self.task_combobox)
+                task = self.projects[project_id].tasks[task_id]
+                notes = self.get_notes(None, True, "", True, text) #TimerStarted
+                self.stop_and_refactor_time("%s %s " % (SWITCH_TO, task)) #refactor any previous time alloted to a task
+                self._add_entry(Entry(project_id=project_id, task_id=task_id, notes=notes))
+        else:
+            got_one = False
+            for entry in entries:
+                if (entry.project_id == self.current_selected_project_id\
+                    and entry.task_id == self.current_selected_task_id): #found existing project/task entry for today, just append to it
+                    #self.harvest.toggle_timer(entry.id)
+                    print 'not running and exists'
+
+                    entry = entry.copy(notes=self.get_notes(entry.notes, True, "", True, text),
+                                       hours=self.ledger.add(entry.id, self._interval, entry.hours))
+                    #append to existing timer
+                    self.timer.start(entry.id, entry.project_id, entry.task_id, write=self._update(entry))
+                    self.apply_locally(entry)
+                    got_one = True
+                    break
+
+            if not got_one:
+                #not the same project task as last one, add new entry
+                print 'not running and doesnt exist'
+                self._add_entry(Entry(
+                    project_id=self.current_selected_project_id,
+                    task_id=self.current_selected_task_id,
+                    notes=self.get_notes(None, True, "", True, text), #TimerStarted
+                ))
+
+        self.set_entries()
+
+    def _add_entry(self, entry):
+        '''
+        queue an add with an interval on it under a local id and time it, the outbox sends anything
+        queued for that id to the id harvest gives it
+        '''
+        entry = self._named(entry.copy(id="local-%s" % uuid4().hex, spent_at=date.today().isoformat()))
+        entry = entry.copy(hours=self.ledger.add(entry.id, self._interval, 0))
+        self.timer.start(entry.id, entry.project_id, entry.task_id,
+                         write={'op': 'add', 'data': entry.update_data(), 'local_id': entry.id})
+        self.apply_locally(entry)
@@ -0,0 +1,203 @@
+'''
+compact models of what harvest sends, built straight from the json and holding only what the app uses
+
+>>> import Models
+>>> entry = Models.Entry.from_json(harvest.get_today()['day_entries'][0])
+>>> entry.project_id, entry.hours, entry.updated #ids are strings, updated is parsed the first time it is read
+('42', 1.5, datetime.datetime(2013, 1, 15, 10, 2, 3, tzinfo=tzutc()))
+>>> harvest.update(entry.id, entry.copy(hours=2.0).update_data())
+>>> projects = Models.Project.catalog(harvest.get_today()['projects'])
+>>> projects['42'].label, projects['42'].tasks['7'].name
+('Client - Project', 'Task')
+>>> catalog = Models.Catalog(projects, collate=True) #sorted as the user's locale sorts
+>>> catalog.project_row('42'), catalog.project_at(3), catalog.task_row('42', '7') #rows of the comboboxes
+(3, '42', 1)
+'''
+
+import locale
+
+import Timestamp
+
+_names = {} #one copy of every task and client name, most projects share them
+
+def _id(value):
+    return intern(str(value)) if value is not None else None #the same ids show up in every entry and project
+
+def _name(value):
+    return _names.setdefault(value, value)
+
+class Task(object):
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(_id(data['id']), _name(data.get('name')))
+
+    def __str__(self):
+        return "%s" % self.name
+
+class Project(object):
+    __slots__ = ('id', 'client', 'name', 'tasks')
+
+    def __init__(self, id, client, name, tasks):
+        '''
+        tasks - task id -> Task
+        '''
+        self.id = id
+        self.client = client
+        self.name = name
+        self.tasks = tasks
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(_id(data['id']), _name(data.get('client')), data.get('name'),
+                   dict((task.id, task) for task in [Task.from_json(t) for t in data.get('tasks', [])]))
+
+    @classmethod
+    def catalog(cls, projects):
+        '''
+        project id -> Project for the projects list of a daily document
+        '''
+        return dict((project.id, project) for project in [cls.from_json(p) for p in projects])
+
+    @property
+    def label(self):
+        return "%s - %s" % (self.client, self.name)
+
+    def __str__(self):
+        return self.label
+
+class Catalog(object):
+    '''
+    projects and their tasks in the order the comboboxes list them. row 0 of both comboboxes is the
+    empty "Select One", so projects and tasks start at row 1 and row 0 stands for none selected
+    '''
+    def __init__(self, projects, collate = False):
+        '''
+        projects - project id -> Project
+        collate - sort labels the way the current LC_COLLATE does, otherwise case insensitive
+        '''
+        self.projects = projects
+        self.collate = collate
+        self.order = tuple(sorted(projects, key=lambda id: self._key(projects[id].label, id))) #row - 1 -> id
+        self.rows = dict((id, row) for row, id in enumerate(self.order, 1))
+        self._tasks = {} #project id -> (task ids in row order, task id -> row), sorted when first asked for
+
+    def project_row(self, project_id):
+        return self.rows.get(project_id, 0)
+
+    def project_at(self, row):
+        return self.order[row - 1] if 0 < row <= len(self.order) else None
+
+    def task_order(self, project_id):
+        return self._task_rows(project_id)[0]
+
+    def task_row(self, project_id, task_id):
+        return self._task_rows(project_id)[1].get(task_id, 0)
+
+    def task_at(self, project_id, row):
+        order = self.task_order(project_id)
+        return order[row - 1] if 0 < row <= len(order) else None
+
+    def _task_rows(self, project_id):
+        if project_id not in self._tasks:
+            tasks = self.projects[project_id].tasks if project_id in self.projects else {}
+            order = tuple(sorted(tasks, key=lambda id: self._key(tasks[id].name, id)))
+            self._tasks[project_id] = (order, dict((id, row) for row, id in enumerate(order, 1)))
+        return self._tasks[project_id]
+
+    def _key(self, text, id):
+        text = u"%s" % text
+        #the id breaks ties, so equal labels always come in the same order
+        return (locale.strxfrm(text.encode('utf-8')) if self.collate else text.lower(), text, id)
+
+class Entry(object):
+    '''
+    a day entry, created_at and updated_at are kept as harvest sent them and parsed when first read
+    '''
+    fields = ('id', 'project_id', 'task_id', 'spent_at', 'hours', 'notes', 'client', 'project', 'task',
+              'created_at', 'updated_at', 'timer_started_at')
+    __slots__ = fields + ('_created', '_updated')
+
+    def __init__(self, id = None, project_id = None, task_id = None, spent_at = None, hours = 0.0, notes = "",
+                 client = None, project = None, task = None, created_at = None, updated_at = None,
+                 timer_started_at = None):
+        self.id = _id(id)
+        self.project_id = _id(project_id)
+        self.task_id = _id(task_id)
+        self.spent_at = spent_at
+        self.hours = float(hours or 0)
+        self.notes = notes or ""
+        self.client = client
+        self.project = project
+        self.task = task
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.timer_started_at = timer_started_at
+        self._created = None
+        self._updated = None
+
+    @classmethod
+    def from_json(cls, data):
+        get = data.get
+        return cls(get('id'), get('project_id'), get('task_id'), get('spent_at'), get('hours'), get('notes'),
+                   get('client'), get('project'), get('task'), get('created_at'), get('updated_at'),
+                   get('timer_started_at'))
+
+    def to_json(self):
+        '''
+        the entry as a daily document lists it
+        '''
+        return dict((field, getattr(self, field)) for field in self.fields)
+
+    def copy(self, **changes):
+        entry = Entry(self.id, self.project_id, self.task_id, self.spent_at, self.hours, self.notes, self.client,
+                      self.project, self.task, self.created_at, self.updated_at, self.timer_started_at)
+        entry._created, entry._updated = self._created, self._updated
+        for key, value in changes.items():
+            setattr(entry, key, value)
+        if 'updated_at' in changes:
+            entry._updated = None
+        return entry
+
+    @property
+    def created(self):
+        if self._created is None and self.created_at:
+            self._created = Timestamp.parse(self.created_at)
+        return self._created
+
+    @property
+    def updated(self):
+        if self._updated is None and self.updated_at:
+            self._updated = Timestamp.parse(self.updated_at)
+        return self._updated
+
+    @property
+    def updated_time(self):
+        '''
+        updated_at as epoch seconds, None when harvest didnt send it
+        '''
+        return Timestamp.epoch(self.updated_at) if self.updated_at else None
+
+    @property
+    def text(self):
+        return "%s %s %s" % (self.hours, self.task, self.project)
+
+    @property
+    def project_label(self):
+        return "%s - %s" % (self.client, self.project)
+
+    def update_data(self):
+        '''
+        what harvest.update and harvest.add are given for this entry
+        '''
+        return {
+            'notes': self.notes,
+            'hours': round(self.hours, 2),
+            'project_id': self.project_id,
+            'task_id': self.task_id,
+        }
@@ -0,0 +1,146 @@
+'''
+the timeline kept in an entry's notes, one line per event as get_notes writes them
+
+    10:02:03: fixing the build #TimerStarted
+    10:20:41: still at it
+    10:31:15: #SwitchTo Code Review
+    11:02:00: #TimerStopped
+
+>>> import Notes
+>>> timeline = Notes.Timeline(entry.notes)
+>>> [(segment.kind, segment.stamp, segment.text) for segment in timeline.segments]
+[('start', '10:02:03', 'fixing the build'), ('note', '10:20:41', 'still at it'), ('switch', '10:31:15', 'Code Review'), ('stop', '11:02:00', '')]
+>>> timeline.stopped
+True
+>>> timeline.durations() #seconds from each stamped segment to the next one
+[(<start 10:02:03>, 1118), (<note 10:20:41>, 634), (<switch 10:31:15>, 1845), (<stop 11:02:00>, None)]
+
+>>> timelines = Notes.Timelines() #one per entry, only lines appended since the last call are parsed
+>>> timelines.get(entry.id, entry.notes).stopped
+'''
+
+import re
+
+START = 'start'
+STOP = 'stop'
+SWITCH = 'switch'
+NOTE = 'note'
+
+STARTED = "#TimerStarted"
+STOPPED = "#TimerStopped"
+SWITCH_TO = "#SwitchTo"
+
+_stamp = re.compile(r'(\d\d):(\d\d):(\d\d): ?(.*)$')
+
+class Segment(object):
+    __slots__ = ('kind', 'stamp', 'at', 'text', 'line')
+
+    def __init__(self, kind, stamp, at, text, line):
+        self.kind = kind #START, STOP, SWITCH or NOTE
+        self.stamp = stamp #HH:MM:SS as written, None for lines typed without one
+        self.at = at #seconds since midnight of stamp
+        self.text = text #the line without its stamp and marker, the task switched to for SWITCH
+        self.line = line
+
+    def __repr__(self):
+        return "<%s %s>" % (self.kind, self.stamp)
+
+def parse_line(line):
+    stamp = at = None
+    text = line
+    found = _stamp.match(line)
+    if found:
+        hours, minutes, seconds, text = found.groups()
+        stamp = "%s:%s:%s" % (hours, minutes, seconds)
+        at = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+    #same rules the timer state was always read with, a stop is the last word and a switch is anywhere
+    words = line.split(" ")
+    if words[-1] == STOPPED:
+        return Segment(STOP, stamp, at, text[:text.rfind(STOPPED)].strip(), line)
+    if line.find(SWITCH_TO) > -1:
+        return Segment(SWITCH, stamp, at, text[text.find(SWITCH_TO) + len(SWITCH_TO):].strip(), line)
+    if words[-1] == STARTED:
+        return Segment(START, stamp, at, text[:text.rfind(STARTED)].strip(), line)
+    return Segment(NOTE, stamp, at, text.strip(), line)
+
+class Timeline(object):
+    __slots__ = ('notes', 'segments', 'parsed')
+
+    def __init__(self, notes = ""):
+        self.notes = ""
+        self.segments = []
+        self.parsed = 0 #lines parsed over the life of the timeline, to see how much extend saved
+        self.extend(notes)
+
+    def extend(self, notes):
+        '''
+        catch up with notes, only the lines after what was parsed already when notes were just appended to
+        '''
+        notes = notes or ""
+        if notes == self.notes:
+            return self
+        if self.notes and notes.startswith(self.notes) and notes[len(self.notes)] == "\n":
+            lines = notes[len(self.notes) + 1:].split("\n")
+        else: #edited, eg. on the web app, start over
+            self.segments = []
+            lines = notes.split("\n") if notes else []
+        self.segments.extend(parse_line(line) for line in lines)
+        self.parsed += len(lines)
+        self.notes = notes
+        return self
+
+    @property
+    def last(self):
+        return self.segments[-1] if self.segments else None
+
+    @property
+    def stopped(self):
+        '''
+        the last line stopped the timer or switched to another task
+        '''
+        return bool(self.segments) and self.segments[-1].kind in (STOP, SWITCH)
+
+    def durations(self, until = None):
+        '''
+        (segment, seconds until the next stamped segment) for every stamped segment, None for the last one
+        unless until is given, seconds since midnight. a day boundary between two stamps counts as one
+        '''
+        stamped = [segment for segment in self.segments if segment.at is not None]
+        durations = []
+        for index, segment in enumerate(stamped):
+            end = stamped[index + 1].at if index + 1 < len(stamped) else until
+            durations.append((segment, (end - segment.at) % 86400 if end is not None else None))
+        return durations
+
+    def worked(self, until = None):
+        '''
+        seconds between every start or switch and the stop or switch that ended it
+        '''
+        total = 0
+        running = None
+        for segment in [s for s in self.segments if s.at is not None] + [None]:
+            end = segment.at if segment else until
+            if running is not None and end is not None and (segment is None or segment.kind in (STOP, SWITCH)):
+                total += (end - running) % 86400
+                running = None
+            if segment and segment.kind in (START, SWITCH) and running is None:
+                running = segment.at
+        return total
+
+class Timelines(object):
+    '''
+    a Timeline per entry id, kept between refreshes so only appended lines are parsed
+    '''
+    size = 500 #entries kept, started over when full
+
+    def __init__(self):
+        self._timelines = {}
+
+    def get(self, entry_id, notes):
+        timeline = self._timelines.get(entry_id)
+        if timeline is None:
+            if len(self._timelines) >= self.size:
+                self._timelines = {}
+            timeline = self._timelines[entry_id] = Timeline()
+        return timeline.extend(notes)
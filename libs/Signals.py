@@ -1,10 +1,12 @@
 import sys
 import gtk
 
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import gobject
 from threading import Thread
 
+from Dispatcher import TODAY
+
 class uiSignalHelpers(object):
     def __init__(self, *args, **kwargs):
         super(uiSignalHelpers, self).__init__(*args, **kwargs)
@@ -62,14 +64,12 @@ class uiSignalHelpers(object):
         return messagedialog
 
     def interval_dialog(self, message):
-        if not self.interval_dialog_showing:
-            if not self.timetracker_window.is_active():
-                self.timetracker_window.show()
-                self.timetracker_window.present()
+        #shown once per expire event of the timer, the answer confirms or declines it
+        if not self.timetracker_window.is_active():
+            self.timetracker_window.show()
+            self.timetracker_window.present()
 
-            self.interval_dialog_showing = True
-            return self.question_message(self.timetracker_window, message, self.on_interval_dialog)
-        return None
+        return self.question_message(self.timetracker_window, message, self.on_interval_dialog)
 
     def stop_interval_dialog(self, message):
         if not self.stop_interval_dialog_showing:
@@ -100,6 +100,7 @@ class uiSignals(uiSignalHelpers):
         self.timetracker_window.connect('destroy', lambda w, e: w.hide() or True)
         self.timetracker_window.connect("window-state-event", self.window_state)
         self.about_dialog.connect("delete-event", lambda w, e: w.hide() or True)
+        self.timesheet_window.connect('delete-event', lambda w, e: w.hide() or True)
         self.about_dialog.connect("response", lambda w, e: w.hide() or True)
         self.notes_textview.connect('key_press_event', self.on_textview_ctrl_enter)
 
@@ -129,33 +130,29 @@ class uiSignals(uiSignalHelpers):
 
     def on_interval_dialog(self, dialog, a): #interval_dialog callback
         if a == gtk.RESPONSE_NO:
+            self.timer.decline()
             self.refresh_and_show()
         else:
             #keep the timer running
-            self.running = True
-            self.current_selected_project_id = self.last_project_id
-            self.current_selected_task_id = self.last_task_id
-            self.current_notes = self.get_notes(self.last_notes)
-            self.current_hours = "%0.02f" % round(float(self.last_hours) + float(self.interval), 2)
-            self.current_text = self.last_text
-            self.current_entry_id = self.last_entry_id
-            entry = self.harvest.update(self.current_entry_id, {#append to existing timer
-                  'notes': self.current_notes,
-                  'hours': self.current_hours,
-                  'project_id': self.current_project_id,
-                  'task_id': self.current_task_id
-            })
+            if self.last:
+                self.current_selected_project_id = self.last.project_id
+                self.current_selected_task_id = self.last.task_id
+                self.current = self.last.copy(notes=self.get_notes(self.last.notes),
+                                              hours=self.ledger.add(self.last.id, self._interval, self.last.hours))
+                self.timer.confirm(write=self._update(self.current)) #append to existing timer
+                self.apply_locally(self.current)
+            else:
+                self.timer.confirm()
 
             self.refresh_and_show()
 
             self.timetracker_window.hide() #hide timetracker and continue task
 
         dialog.destroy()
+        self.interval_dialog_instance = None
 
         self.attention = None
 
-        self.interval_dialog_showing = False
-
     def on_textview_ctrl_enter(self, widget, event):
         '''
         submit clicked event on ctrl+enter in notes textview
@@ -178,7 +175,6 @@ class uiSignals(uiSignalHelpers):
     def on_save_preferences_button_clicked(self, widget):
         if self.running: #if running it will turn off, lets empty the comboboxes
             #stop the timer
-            #self.toggle_current_timer(self.current_entry_id) #maybe add pref option to kill timer on pref change?
             if self.interval_dialog_instance:
                 self.interval_dialog_instance.hide() #hide the dialog
             self.stop_and_refactor_time()
@@ -194,28 +190,43 @@ class uiSignals(uiSignalHelpers):
         new_idx = widget.get_active()
         if new_idx != -1:
             if new_idx != self.current_selected_task_idx: #-1 is sent from pygtk loop or something
-                self.current_selected_task_id = self.get_combobox_selection(widget)
+                self.current_selected_task_id = self.catalog.task_at(self.current_selected_project_id, new_idx)
                 self.current_selected_task_idx = new_idx
-                self.refresh_comboboxes()
+                self.refresh_comboboxes(False) #the catalog did not change, only the selection
 
     def on_project_combobox_changed(self, widget):
-        self.current_selected_project_id = self.get_combobox_selection(widget)
         new_idx = widget.get_active()
+        self.current_selected_project_id = self.catalog.project_at(new_idx)
         if new_idx != -1:
             #reset task when new project is selected
             self.current_selected_project_idx = new_idx
             self.current_selected_task_id = None
             self.current_selected_task_idx = 0
-            self.refresh_comboboxes()
+            self.refresh_comboboxes(False)
 
     def on_show_preferences(self, widget):
         self.preferences_window.show()
         self.preferences_window.present()
 
+    def on_show_timesheet(self, widget):
+        self.show_timesheet(date.today())
+
+    def on_timesheet_previous_button_clicked(self, widget):
+        self.show_timesheet(self.timesheet_day - timedelta(days=7))
+
+    def on_timesheet_next_button_clicked(self, widget):
+        self.show_timesheet(self.timesheet_day + timedelta(days=7))
+
+    def on_timesheet_refresh_button_clicked(self, widget):
+        self.show_timesheet(force=True)
+
     def on_away_from_desk(self, widget):
         #toggle away state
-        if self.running:
-            self.away_from_desk = True if not self.away_from_desk else False
+        if self.away_from_desk:
+            self.timer.back()
+        else:
+            self.timer.away_from_desk()
+        self.set_status_icon()
 
     def on_check_for_updates(self, widget):
         pass
@@ -226,7 +237,7 @@ class uiSignals(uiSignalHelpers):
 
 
     def on_submit_button_clicked(self, widget):
-        self.away_from_desk = False
+        self.timer.back()
         self.attention = None
         self.append_add_entry()
 
@@ -238,10 +249,17 @@ class uiSignals(uiSignalHelpers):
         self.stop_and_refactor_time()
 
     def on_quit(self, widget):
-        if self.running and self.harvest:
-            self.harvest.toggle_timer(self.current_entry_id)
-
-        gtk.main_quit()
+        if not self.harvest:
+            return gtk.main_quit()
+
+        #the timer knows its entry before the first refresh lands, or when it is not in today's list
+        entry_id = self.current.id if self.current else self.timer.entry_id
+        if self.running and entry_id:
+            self.send(self.harvest.toggle_timer, entry_id)
+        #send what we can, the journal replays the rest on next start. the ui keeps painting meanwhile
+        self.statusbar.push(0, "Sending %s Unsent" % self.harvest.pending())
+        self.dispatcher.run(self.harvest.flush, (5,), done=lambda left: gtk.main_quit(),
+                            failed=lambda e: gtk.main_quit(), key=TODAY)
 
     def refresh_and_show(self):
         self.set_entries()
@@ -278,6 +296,10 @@ class uiSignals(uiSignalHelpers):
             away.connect("activate", self.on_away_from_desk)
             menu.append(away)
 
+        week = gtk.MenuItem("Week")
+        week.connect("activate", self.on_show_timesheet)
+        menu.append(week)
+
         top = gtk.MenuItem("Always on top")
 
         prefs = gtk.MenuItem("Preferences")
@@ -0,0 +1,395 @@
+'''
+local sqlite copy of what harvest sent us, days of entries plus the project/task catalog
+
+>>> import Store
+>>> store = Store.Store("data/config/store.sqlite")
+>>> store.sync_day(harvest.get_today()) #keep the answer
+>>> store.get_day("2013-01-15") #same shape as harvest.get_today(), without the round trip
+{'for_day': '2013-01-15', 'day_entries': [...], 'projects': [...], 'fingerprint': 'c4ca4238a0b9...'}
+>>> store.get_day("2013-01-15", catalog=False) #without projects, get_projects has them as models
+>>> store.get_projects()['42'].tasks['7'].name
+>>> store.catalog_fingerprint() #changes only when a project or task is added, renamed or removed
+>>> store.entries_between("2013-01-01", "2013-01-31", project_id=42)
+>>> store.sync_day(harvest.get_today(), watermark=since) #since - harvest.server_time() taken before the call
+>>> store.merge_entries(harvest.get_entries(user_id, day, day, store.watermark(day)), day, watermark=since)
+>>> store.search("JIRA-1234") #notes of every synced day, newest first
+>>> store.search("JIRA-12* deploy", project_id=42, limit=20) #trailing * matches a prefix
+
+bin/timetracker-search "JIRA-12*" --project 42 searches the store of the account logged in from the command line
+'''
+
+import re
+import json
+from hashlib import md5
+import sqlite3
+from datetime import date
+from threading import Lock
+from time import time
+
+from Models import Project
+
+class StoreError(Exception):
+    pass
+
+class Store(object):
+    schema = '''
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            spent_at TEXT NOT NULL,
+            project_id INTEGER,
+            task_id INTEGER,
+            hours REAL,
+            notes TEXT,
+            updated_at TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_spent_at ON entries (spent_at);
+        CREATE INDEX IF NOT EXISTS entries_project_id ON entries (project_id);
+        CREATE INDEX IF NOT EXISTS entries_task_id ON entries (task_id);
+        CREATE INDEX IF NOT EXISTS entries_updated_at ON entries (updated_at);
+
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY,
+            client TEXT,
+            name TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS tasks (
+            project_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            name TEXT,
+            PRIMARY KEY (project_id, id)
+        );
+
+        CREATE TABLE IF NOT EXISTS days (
+            spent_at TEXT PRIMARY KEY,
+            synced_at REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS watermarks (
+            spent_at TEXT PRIMARY KEY,
+            updated_since REAL NOT NULL
+        );
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS entry_notes USING fts4 (notes, prefix="2,4");
+    '''
+
+    def __init__(self, path = ":memory:"):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False) #shared by the ui and the harvest workers
+        self.db.row_factory = sqlite3.Row
+        self._lock = Lock()
+        self._projects = None #project id -> Project, rebuilding thousands of projects from rows is the slow part of a read
+        self._fingerprint = None #of _projects
+        self.catalog_writes = 0 #daily documents whose catalog differed from the stored one
+        self.catalog_writes_skipped = 0 #and those whose catalog was the same, nothing written
+        with self._lock:
+            self.db.executescript(self.schema)
+            self._index_notes() #stores synced before notes were indexed
+            self.db.commit()
+
+    def sync_day(self, harvest_data, day = None, watermark = None):
+        '''
+        store a daily document, entries of that day missing from it were deleted on harvest
+        day - iso date the document is for, read from the document when not given
+        watermark - harvest time the document is at least as new as, see merge_entries
+        '''
+        day = day or harvest_data.get('for_day') or date.today().isoformat()
+        entries = harvest_data.get('day_entries', [])
+
+        with self._lock:
+            try:
+                ids = [entry['id'] for entry in entries]
+                self.db.execute("DELETE FROM entry_notes WHERE docid IN (SELECT id FROM entries WHERE spent_at = ? AND "
+                                "id NOT IN (%s))" % ",".join("?" * len(ids)), [day] + ids)
+                self.db.execute("DELETE FROM entries WHERE spent_at = ? AND id NOT IN (%s)" %
+                                ",".join("?" * len(ids)), [day] + ids)
+                self._upsert_entries(entries, day)
+                self._index_notes(ids)
+                projects = None
+                if 'projects' in harvest_data: #slim documents leave the catalog out
+                    projects, fingerprint = self._replace_catalog(harvest_data['projects'])
+                self._synced(day, watermark)
+                self.db.commit()
+                if projects is not None:
+                    self._projects, self._fingerprint = projects, fingerprint
+            except sqlite3.Error as e:
+                self.db.rollback()
+                self._projects = self._fingerprint = None
+                raise StoreError(e)
+
+    def merge_entries(self, entries, day, watermark = None):
+        '''
+        store entries changed since the watermark of day, unlike sync_day nothing missing is deleted.
+        entries from harvest's entries list lack the project, task and client names, taken from the catalog
+        watermark - harvest time to ask for changes since next time
+        '''
+        projects = self.get_projects()
+        for entry in entries:
+            project = projects.get(str(entry.get('project_id')))
+            if project and 'project' not in entry:
+                entry['project'] = project.name
+                entry['client'] = project.client
+                task = project.tasks.get(str(entry.get('task_id')))
+                entry['task'] = task.name if task else None
+
+        with self._lock:
+            try:
+                self._upsert_entries(entries, day)
+                self._index_notes([entry['id'] for entry in entries])
+                self._synced(day, watermark)
+                self.db.commit()
+            except sqlite3.Error as e:
+                self.db.rollback()
+                raise StoreError(e)
+
+    def watermark(self, day = None):
+        '''
+        harvest time the last sync of day is known to be current at, None when it needs a full sync
+        '''
+        day = day or date.today().isoformat()
+        with self._lock:
+            row = self.db.execute("SELECT updated_since FROM watermarks WHERE spent_at = ?", (day,)).fetchone()
+        return row['updated_since'] if row else None
+
+    def get_day(self, day = None, catalog = True):
+        '''
+        a daily document rebuilt from the store, None when the day was never synced
+        catalog - include projects, leave it out when get_projects will do
+        '''
+        day = day or date.today().isoformat()
+        with self._lock:
+            if not self.db.execute("SELECT 1 FROM days WHERE spent_at = ?", (day,)).fetchone():
+                return None
+            entries = self._entries("WHERE spent_at = ? ORDER BY id", (day,))
+        data = {'for_day': day, 'day_entries': entries, 'fingerprint': self.catalog_fingerprint()}
+        if catalog:
+            data['projects'] = self.get_catalog()
+        return data
+
+    def get_catalog(self):
+        '''
+        projects with their tasks, shaped like the projects list of a daily document and read from the db
+        '''
+        with self._lock:
+            return self._read_catalog()
+
+    def get_projects(self):
+        '''
+        project id -> Project, shared between callers so treat it as read only
+        '''
+        with self._lock:
+            return self._load_catalog()
+
+    def catalog_fingerprint(self):
+        '''
+        md5 of the catalog, equal fingerprints mean equal catalogs
+        '''
+        with self._lock:
+            self._load_catalog()
+            return self._fingerprint
+
+    def entries_between(self, start, end, project_id = None, task_id = None):
+        '''
+        entries spent from start to end, both iso dates and included
+        '''
+        where = "WHERE spent_at BETWEEN ? AND ?"
+        args = [start, end]
+        if project_id is not None:
+            where += " AND project_id = ?"
+            args.append(int(project_id))
+        if task_id is not None:
+            where += " AND task_id = ?"
+            args.append(int(task_id))
+        with self._lock:
+            return self._entries(where + " ORDER BY spent_at, id", args)
+
+    def search(self, query, project_id = None, start = None, end = None, limit = 100):
+        '''
+        entries whose notes have every word of query, newest day first then by project.
+        a word ending in * matches as a prefix, words joined by punctuation like JIRA-1234 match as a phrase
+        start, end - iso dates limiting the days searched
+        '''
+        match = self._match(query)
+        if not match:
+            return []
+        where = "WHERE entry_notes MATCH ?"
+        args = [match]
+        if project_id is not None:
+            where += " AND entries.project_id = ?"
+            args.append(int(project_id))
+        if start:
+            where += " AND entries.spent_at >= ?"
+            args.append(start)
+        if end:
+            where += " AND entries.spent_at <= ?"
+            args.append(end)
+        args.append(limit)
+        with self._lock:
+            return [json.loads(row['data']) for row in self.db.execute(
+                "SELECT entries.data FROM entry_notes JOIN entries ON entries.id = entry_notes.docid %s "
+                "ORDER BY entries.spent_at DESC, entries.project_id, entries.id LIMIT ?" % where, args)]
+
+    def synced_days(self):
+        with self._lock:
+            return dict((row['spent_at'], row['synced_at']) for row in self.db.execute("SELECT * FROM days"))
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def _load_catalog(self):
+        if self._projects is None:
+            catalog = self._read_catalog()
+            self._projects, self._fingerprint = Project.catalog(catalog), _fingerprint(catalog)
+        return self._projects
+
+    def _read_catalog(self):
+        projects = {}
+        catalog = []
+        for row in self.db.execute("SELECT id, client, name FROM projects ORDER BY id"):
+            project = {'id': row['id'], 'client': row['client'], 'name': row['name'], 'tasks': []}
+            projects[row['id']] = project
+            catalog.append(project)
+        for row in self.db.execute("SELECT project_id, id, name FROM tasks ORDER BY project_id, id"):
+            if row['project_id'] in projects:
+                projects[row['project_id']]['tasks'].append({'id': row['id'], 'name': row['name']})
+        return catalog
+
+    def _entries(self, where, args):
+        return [json.loads(row['data']) for row in self.db.execute("SELECT data FROM entries %s" % where, args)]
+
+    def _upsert_entries(self, entries, day):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO entries (id, spent_at, project_id, task_id, hours, notes, updated_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(entry['id'], entry.get('spent_at') or day, self._int(entry.get('project_id')),
+              self._int(entry.get('task_id')), entry.get('hours'), entry.get('notes'), entry.get('updated_at'),
+              json.dumps(entry)) for entry in entries])
+
+    def _synced(self, day, watermark):
+        self.db.execute("INSERT OR REPLACE INTO days (spent_at, synced_at) VALUES (?, ?)", (day, time()))
+        if watermark is not None:
+            self.db.execute("INSERT OR REPLACE INTO watermarks (spent_at, updated_since) VALUES (?, ?)",
+                            (day, watermark))
+
+    def _index_notes(self, ids = None):
+        '''
+        (re)index the notes of entries, all of those not indexed yet when ids is None
+        '''
+        if ids is None:
+            self.db.execute("INSERT INTO entry_notes (docid, notes) SELECT id, notes FROM entries "
+                            "WHERE notes IS NOT NULL AND id NOT IN (SELECT docid FROM entry_notes)")
+            return
+        for chunk in range(0, len(ids), 500): #stay under sqlites limit of bound parameters
+            marks = ",".join("?" * len(ids[chunk:chunk + 500]))
+            self.db.execute("DELETE FROM entry_notes WHERE docid IN (%s)" % marks, ids[chunk:chunk + 500])
+            self.db.execute("INSERT INTO entry_notes (docid, notes) SELECT id, notes FROM entries "
+                            "WHERE notes IS NOT NULL AND id IN (%s)" % marks, ids[chunk:chunk + 500])
+
+    def _match(self, query):
+        '''
+        fts query out of what the user typed, so their punctuation is never read as fts syntax
+        '''
+        terms = []
+        for word in query.split():
+            tokens = re.findall(r'\w+', word, re.UNICODE)
+            if not tokens:
+                continue
+            term = " ".join(tokens) + ("*" if word.endswith("*") else "")
+            terms.append('"%s"' % term)
+        return " ".join(terms)
+
+    def _replace_catalog(self, projects):
+        '''
+        returns the catalog as get_projects would read it back and its fingerprint,
+        nothing is written when it is the catalog we already have
+        '''
+        catalog = normalize_catalog(projects)
+        fingerprint = _fingerprint(catalog)
+        current = self._load_catalog()
+        if fingerprint == self._fingerprint:
+            self.catalog_writes_skipped += 1
+            return current, fingerprint #keep handing out the same models
+        self.catalog_writes += 1
+
+        self.db.execute("DELETE FROM projects")
+        self.db.execute("DELETE FROM tasks")
+        self.db.executemany("INSERT OR REPLACE INTO projects (id, client, name) VALUES (?, ?, ?)",
+                            [(project['id'], project['client'], project['name']) for project in catalog])
+        self.db.executemany("INSERT OR REPLACE INTO tasks (project_id, id, name) VALUES (?, ?, ?)",
+                            [(project['id'], task['id'], task['name'])
+                             for project in catalog for task in project['tasks']])
+        return Project.catalog(catalog), fingerprint
+
+    def _int(self, value):
+        return int(value) if value is not None and str(value).isdigit() else value
+
+def normalize_catalog(projects):
+    '''
+    projects of a daily document as the store keeps them, sorted by id with only the fields it keeps
+    '''
+    return sorted([{
+        'id': project['id'], 'client': project.get('client'), 'name': project.get('name'),
+        'tasks': sorted([{'id': task['id'], 'name': task.get('name')} for task in project.get('tasks', [])],
+                        key=lambda task: task['id']),
+    } for project in projects], key=lambda project: project['id'])
+
+def catalog_fingerprint(projects):
+    '''
+    fingerprint of the projects of a daily document, the same Store.catalog_fingerprint gives once it is stored
+    '''
+    return _fingerprint(normalize_catalog(projects))
+
+def _fingerprint(catalog):
+    digest = md5()
+    for project in catalog: #a line per project and task, far cheaper than dumping the catalog to json
+        digest.update((u"p\x1f%s\x1f%s\x1f%s\n" % (project['id'], project['client'], project['name'])).encode('utf-8'))
+        for task in project['tasks']:
+            digest.update((u"t\x1f%s\x1f%s\n" % (task['id'], task['name'])).encode('utf-8'))
+    return digest.hexdigest()
+
+def main(argv = None):
+    import os
+    import argparse
+    import ConfigParser
+
+    from Helpers import account_filename
+    from data import PathConfig
+
+    config_path = "%s/../%s" % (os.path.dirname(os.path.abspath(__file__)), PathConfig.config_path_dir)
+    parser = argparse.ArgumentParser(description="Search the notes of the days kept in the local store")
+    parser.add_argument("query", nargs="+", help="words the notes must all have, a trailing * matches a prefix")
+    parser.add_argument("--project", type=int, help="project id to search in")
+    parser.add_argument("--start", help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", help="last day, YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=100, help="entries shown at most")
+    parser.add_argument("--store", help="sqlite store to search, the one of the account in harvest.cfg by default")
+    args = parser.parse_args(argv)
+
+    path = args.store
+    if not path:
+        config = ConfigParser.SafeConfigParser()
+        config.read("%sharvest.cfg" % config_path)
+        try:
+            uri, username = config.get('auth', 'uri'), config.get('auth', 'username')
+        except ConfigParser.Error:
+            parser.error("no account in %sharvest.cfg, log in once or pass --store" % config_path)
+        path = account_filename(config_path, uri, username, "store-%s.sqlite")
+    if not os.path.exists(path):
+        parser.error("no store at %s, it is created once the account has synced a day" % path)
+
+    store = Store(path) #indexes notes of entries synced before the index existed
+    try:
+        entries = store.search(" ".join(args.query), args.project, args.start, args.end, args.limit)
+    except (StoreError, sqlite3.Error) as e:
+        print "search failed: %s" % e
+        return 1
+    finally:
+        store.close()
+    for entry in entries:
+        notes = " / ".join(line.strip() for line in (entry.get('notes') or "").splitlines() if line.strip())
+        print ("%s %5.2f  %s - %s  %s" % (entry.get('spent_at'), float(entry.get('hours') or 0),
+                                         entry.get('project'), entry.get('task'), notes)).encode('utf-8')
+    print "%s entries" % len(entries)
+    return 0 if entries else 1
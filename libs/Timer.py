@@ -0,0 +1,266 @@
+'''
+the local timer, a state machine driven by an append-only log of user and timer events
+
+    idle -> running <-> away
+               |  \
+               |   prompting -> running, when the user is still working on it
+               v        |
+            stopped <---+
+
+>>> import Timer
+>>> timer = Timer.Timer("data/config/timer.journal", clock) #replays the journal, the state is known before harvest is asked
+>>> timer.start("42", "1", "7") #entry, project and task the user is working on
+True
+>>> timer.state, timer.running
+('running', True)
+>>> timer.expired(1200) #interval in seconds ran out since the last start, confirm or extend
+False
+>>> timer.stop() #events that make no sense in the current state are ignored and return False
+True
+>>> timer.back()
+False
+>>> timer.sync("43", "1", "8", at=clock.local(updated), state=Timer.RUNNING) #harvest changed after our last event, eg. the web app
+>>> timer.skip(7200) #the machine slept 2 hours, they do not count towards the interval
+
+harvest writes are journaled with the event they come from and handed to send, a write whose queuing
+was never journaled, eg. a crash between the two, is sent again when the journal is replayed
+>>> timer = Timer.Timer("data/config/timer.journal", clock, send=lambda write, cause: outbox.queue(write, cause))
+>>> timer.stop(write={'op': 'update', 'entry_id': "42", 'data': entry.update_data()})
+True
+'''
+
+from time import time
+from threading import Lock
+import Journal
+
+IDLE = 'idle'
+RUNNING = 'running'
+AWAY = 'away'
+PROMPTING = 'prompting'
+STOPPED = 'stopped'
+
+ON = (RUNNING, AWAY, PROMPTING) #states an entry is being timed in
+
+class Timer(object):
+    #event -> (states it can happen in, state it leads to)
+    transitions = {
+        'start': ((IDLE, STOPPED) + ON, RUNNING), #a start while on switches entries
+        'stop': (ON, STOPPED),
+        'away': ((RUNNING,), AWAY),
+        'back': ((AWAY,), RUNNING),
+        'extend': ((AWAY,), AWAY), #interval ran out while away, the time was counted and a new one began
+        'expire': ((RUNNING,), PROMPTING), #interval ran out, the user is asked whether they are still on it
+        'confirm': ((PROMPTING,), RUNNING),
+        'decline': ((PROMPTING,), STOPPED),
+        'skip': ((RUNNING, AWAY), None), #a gap that does not count, the interval is moved past it
+    }
+    compact_after = 1000 #events in the journal before it is rewritten as one snapshot
+
+    def __init__(self, path = None, clock = None, send = None):
+        '''
+        path - journal of events, None keeps them in memory only
+        clock - Clock.Clock events are timed on, the wall clock when not given
+        send - send(write, cause) queues the harvest write of an event and returns its outbox seq, None when
+               it could not. cause is the same for every try of one write so it is only queued once
+        '''
+        self.path = path
+        self.send = send
+        self._now = clock.now if clock else time
+        self.state = IDLE
+        self.entry_id = None
+        self.project_id = None
+        self.task_id = None
+        self.since = None #time the current interval began
+        self.changed_at = 0 #time of the last event
+
+        self.events = [] #this session's events, the journal has the ones before
+        self.ignored = 0 #events that made no sense in their state
+        self.synced = 0 #changes taken from harvest
+
+        self._seq = 0
+        self._unqueued = {} #seq -> event whose write is not known to be queued yet
+        self._lock = Lock()
+        self._load()
+
+    @property
+    def running(self):
+        '''
+        the user is working and time is counted, away included
+        '''
+        return self.state in (RUNNING, AWAY)
+
+    @property
+    def away(self):
+        return self.state == AWAY
+
+    @property
+    def prompting(self):
+        return self.state == PROMPTING
+
+    def start(self, entry_id, project_id, task_id, at = None, write = None):
+        '''
+        write - the harvest write that goes with the event, {'op': 'update', 'entry_id': .., 'data': ..} and
+                the like, sent even when the event makes no sense in the current state
+        '''
+        return self._event('start', at, write, entry_id=str(entry_id), project_id=project_id, task_id=task_id)
+
+    def stop(self, at = None, write = None):
+        return self._event('stop', at, write)
+
+    def away_from_desk(self, at = None, write = None):
+        return self._event('away', at, write)
+
+    def back(self, at = None, write = None):
+        return self._event('back', at, write)
+
+    def extend(self, at = None, write = None):
+        return self._event('extend', at, write)
+
+    def expire(self, at = None, write = None):
+        return self._event('expire', at, write)
+
+    def confirm(self, at = None, write = None):
+        return self._event('confirm', at, write)
+
+    def decline(self, at = None, write = None):
+        return self._event('decline', at, write)
+
+    def skip(self, seconds, at = None):
+        return self._event('skip', at, seconds=seconds)
+
+    def sync(self, entry_id, project_id, task_id, at, state):
+        '''
+        take harvest's view of the newest entry when it changed after our last event and disagrees with us
+        at - when harvest says the entry was updated
+        state - RUNNING, STOPPED when its notes say so, None when harvest cant tell, eg. it just ran out
+        '''
+        if state is None or at is None or at <= self.changed_at:
+            return False
+        if state == RUNNING and self.state in ON and self.entry_id == str(entry_id):
+            return False
+        if state == STOPPED and self.state not in ON:
+            return False
+        self.synced += 1
+        return self._event('synced', at, None, state=state, entry_id=str(entry_id), project_id=project_id,
+                           task_id=task_id)
+
+    def expired(self, interval, now = None):
+        '''
+        the interval in seconds ran out while running or away
+        '''
+        return self.running and self.since is not None and (now or self._now()) > self.since + interval
+
+    def left(self, interval, now = None):
+        '''
+        seconds until the interval runs out, 0 when it has or nothing is timed
+        '''
+        if self.state not in ON or self.since is None:
+            return 0
+        return max(0, self.since + interval - (now or self._now()))
+
+    def overrun(self, interval, now = None):
+        '''
+        seconds past the end of the interval, 0 when it has not run out or nothing is timed
+        '''
+        if self.state not in ON or self.since is None:
+            return 0
+        return max(0, (now or self._now()) - self.since - interval)
+
+    def stats(self):
+        return {'state': self.state, 'events': len(self.events), 'ignored': self.ignored, 'synced': self.synced,
+                'unqueued': len(self._unqueued)}
+
+    def _event(self, name, at, write = None, **fields):
+        with self._lock:
+            event = dict(fields, event=name, at=at or self._now())
+            if not self._apply(event):
+                self.ignored += 1
+                applied = False
+            else:
+                self._seq += 1
+                event['seq'] = self._seq
+                if write:
+                    event['write'] = write
+                    self._unqueued[event['seq']] = event
+                self.events.append(event)
+                self._write(event)
+                applied = True
+        if write:
+            self._queue(event if applied else {'write': write}) #not journaled, nothing to replay it from
+        return applied
+
+    def _queue(self, event):
+        '''
+        hand the write of event to send, journal that it was queued
+        '''
+        if not self.send:
+            return
+        seq = event.get('seq')
+        queued = self.send(event['write'], "timer-%s" % seq if seq else None)
+        if seq and queued is not None:
+            with self._lock:
+                self._unqueued.pop(seq, None)
+                self._write({'queued': seq, 'outbox': queued})
+
+    def _resend(self):
+        '''
+        writes journaled with their event but never queued, in the order of their events
+        '''
+        for seq in sorted(self._unqueued):
+            self._queue(self._unqueued[seq])
+
+    def _apply(self, event):
+        name = event['event']
+        if name == 'synced':
+            state = event['state']
+        elif name == 'restored':
+            state = event['state']
+            self.since = event.get('since')
+        else:
+            allowed, state = self.transitions[name]
+            if self.state not in allowed:
+                return False
+            state = state or self.state
+
+        if name in ('start', 'synced', 'restored'):
+            self.entry_id = event.get('entry_id')
+            self.project_id = event.get('project_id')
+            self.task_id = event.get('task_id')
+        if name in ('start', 'extend', 'confirm', 'synced'):
+            self.since = event['at'] #a new interval begins
+        if name == 'skip' and self.since is not None:
+            self.since += event['seconds']
+        if state not in ON:
+            self.since = None
+        self.state = state
+        self.changed_at = event['at']
+        return True
+
+    def _snapshot(self):
+        return {'event': 'restored', 'at': self.changed_at, 'seq': self._seq, 'state': self.state,
+                'entry_id': self.entry_id, 'project_id': self.project_id, 'task_id': self.task_id,
+                'since': self.since}
+
+    def _load(self):
+        if not self.path:
+            return
+        count = 0
+        for event in Journal.read(self.path):
+            if 'queued' in event:
+                self._unqueued.pop(event['queued'], None)
+                continue
+            if event.get('write'):
+                self._unqueued[event['seq']] = event
+            self._apply(event)
+            self._seq = max(self._seq, event.get('seq', 0))
+            count += 1
+        self._resend()
+        if count > self.compact_after and not self._unqueued: #the snapshot keeps no writes
+            self._compact()
+
+    def _compact(self):
+        Journal.rewrite(self.path, [self._snapshot()])
+
+    def _write(self, event):
+        if self.path:
+            Journal.append(self.path, event)
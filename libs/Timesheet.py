@@ -0,0 +1,143 @@
+'''
+week timesheet read from the local store, past days are kept for long and today is always asked again
+
+>>> import Timesheet
+>>> timesheet = Timesheet.Timesheet(harvest, store)
+>>> timesheet.week("2013-01-16") #monday to sunday around that day, straight from the store
+[('2013-01-14', {'for_day': '2013-01-14', 'day_entries': [...], 'fingerprint': '...'}), ..., ('2013-01-20', None)]
+>>> timesheet.stale("2013-01-16") #days harvest has to be asked for, today and past days never synced since they ended
+['2013-01-14', '2013-01-16']
+>>> timesheet.refresh("2013-01-16").result() #stale days fetched at once, then the week again from the store
+>>> timesheet.rows(timesheet.week("2013-01-16"))
+[('Client - Project', 'Task', [0.0, 1.5, 0.0, 0.0, 0.0, 0.0, 0.0], 1.5), ...]
+'''
+
+from datetime import date, timedelta
+from time import time, mktime
+from threading import Lock
+
+from Harvest import HarvestFuture, HarvestError
+from Store import StoreError
+from Timestamp import day as _day
+
+class Timesheet(object):
+    past_ttl = 24 * 3600 #seconds a past day is trusted after it was synced, they rarely change once over
+
+    def __init__(self, harvest, store, past_ttl = None):
+        '''
+        harvest - Harvest, days are fetched through its AsyncHarvest so they run at the same time
+        store - Store every fetched day is synced into and the week is read from
+        '''
+        self.harvest = harvest
+        self.store = store
+        if past_ttl is not None:
+            self.past_ttl = past_ttl
+        self.errors = {} #iso day -> HarvestError or StoreError of the last refresh
+
+    def days(self, day = None):
+        '''
+        iso days monday to sunday of the week day is in
+        '''
+        day = _day(day or date.today())
+        monday = day - timedelta(days=day.weekday())
+        return [(monday + timedelta(days=offset)).isoformat() for offset in range(7)]
+
+    def week(self, day = None):
+        '''
+        (iso day, daily document) for every day of the week as the store has them, None for days never synced
+        '''
+        return [(d, self.store.get_day(d, catalog=False)) for d in self.days(day)]
+
+    def stale(self, day = None, force = False):
+        '''
+        iso days of the week to ask harvest for. today always, it is revalidated with a conditional request.
+        past days when never synced after they ended or longer than past_ttl ago, days to come never
+        force - every past day too, eg. the user asked for a refresh
+        '''
+        today = date.today().isoformat()
+        synced = self.store.synced_days()
+        stale = []
+        for d in self.days(day):
+            if d > today:
+                continue
+            synced_at = synced.get(d)
+            if d == today or force or synced_at is None:
+                stale.append(d)
+            elif synced_at < _end_of(d) or time() - synced_at > self.past_ttl:
+                stale.append(d) #synced while it was still going on, or trusted long enough
+        return stale
+
+    def refresh(self, day = None, force = False, token = None):
+        '''
+        fetch the stale days of the week all at once and sync them into the store,
+        returns a HarvestFuture of the week once every one of them is back. failed days keep
+        whatever the store had and their error is in errors
+        token - HarvestCancelToken, cancelled days are left alone
+        '''
+        future = HarvestFuture()
+        stale = self.stale(day, force)
+        self.errors = {}
+        if not stale:
+            future.set_result(self.week(day))
+            return future
+
+        today = date.today().isoformat()
+        left = [len(stale)]
+        lock = Lock()
+
+        def landed(d, fetched):
+            #runs on a pool worker that swallows errors, every day must count down or the week never resolves
+            try:
+                self.store.sync_day(self.harvest.outbox.overlay(fetched.result()), d)
+            except (HarvestError, StoreError) as e:
+                self.errors[d] = e
+            except Exception as e: #eg. a malformed day, the week fails with it, first answer wins
+                self.errors[d] = e
+                future.set_exception(e)
+            finally:
+                with lock:
+                    left[0] -= 1
+                    finished = not left[0]
+                if finished:
+                    try:
+                        future.set_result(self.week(day))
+                    except Exception as e:
+                        future.set_exception(e)
+
+        for d in stale:
+            if d == today:
+                fetched = self.harvest.client.get_today(token=token) #shares the main refresh and its validators
+            else:
+                when = _day(d).timetuple()
+                #the catalog comes with today, past days only need their entries
+                fetched = self.harvest.client.get_day(when.tm_yday, when.tm_year, token=token, params={'slim': 1})
+            fetched.add_done_callback(lambda f, d=d: landed(d, f))
+        return future
+
+    def rows(self, week):
+        '''
+        (project, task, hours of each day, total) for every project and task with time on the week,
+        sorted by project then task
+        '''
+        rows = {}
+        for index, (d, data) in enumerate(week):
+            for entry in (data or {}).get('day_entries', []):
+                key = (str(entry.get('project_id')), str(entry.get('task_id')))
+                if key not in rows:
+                    rows[key] = ["%s - %s" % (entry.get('client'), entry.get('project')), "%s" % entry.get('task'),
+                                 [0.0] * len(week)]
+                rows[key][2][index] += float(entry.get('hours') or 0)
+        return sorted([(project, task, hours, sum(hours)) for project, task, hours in rows.values()])
+
+def totals(rows, days = 7):
+    '''
+    hours of each day and of the week over every row
+    '''
+    hours = [sum(row[2][index] for row in rows) for index in range(days)]
+    return hours, sum(hours)
+
+def _end_of(day):
+    '''
+    epoch seconds of local midnight after the iso day
+    '''
+    return mktime((_day(day) + timedelta(days=1)).timetuple())
@@ -0,0 +1,85 @@
+'''
+parsing of harvest timestamps, "2013-01-15T10:02:03Z" and the like
+
+>>> import Timestamp
+>>> Timestamp.parse("2013-01-15T10:02:03Z")
+datetime.datetime(2013, 1, 15, 10, 2, 3, tzinfo=tzutc())
+>>> Timestamp.epoch("2013-01-15T10:02:03Z") #seconds since the epoch, compare with time.time()
+1358244123.0
+>>> Timestamp.day("2013-01-15") #an iso day, dates are passed through
+datetime.date(2013, 1, 15)
+
+answers are kept per raw string, harvest sends the same updated_at again on every refresh.
+anything not in harvest's format goes through dateutil
+'''
+
+import re
+from calendar import timegm
+from datetime import datetime, date
+
+from dateutil.parser import parse as _parse
+from dateutil.tz import tzutc, tzoffset
+
+_format = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?(Z|[+-]\d\d:?\d\d)?$')
+
+_utc = tzutc()
+_zones = {0: _utc} #utc offset in seconds -> tzinfo, harvest only ever uses a couple
+_cache = {} #raw string -> (datetime, epoch)
+cache_size = 10000 #raw strings kept, started over when full, a day of entries is a few dozen
+
+def parse(raw):
+    '''
+    aware datetime of a timestamp, utc when it has no offset
+    '''
+    return _lookup(raw)[0]
+
+def epoch(raw):
+    '''
+    seconds since the epoch of a timestamp
+    '''
+    return _lookup(raw)[1]
+
+def day(value):
+    '''
+    date of an iso day, "2013-01-15", or of a date
+    '''
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _lookup(raw):
+    try:
+        return _cache[raw]
+    except KeyError:
+        pass
+
+    found = _format.match(raw)
+    if found:
+        year, month, day, hour, minute, second, fraction, zone = found.groups()
+        offset = _offset(zone)
+        value = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                         int(fraction.ljust(6, '0')) if fraction else 0, _zone(offset))
+    else:
+        value = _parse(raw)
+        if not value.tzinfo:
+            value = value.replace(tzinfo=_utc)
+        offset = int(value.utcoffset().total_seconds())
+
+    seconds = timegm(value.timetuple()) - offset + value.microsecond / 1e6
+    if len(_cache) >= cache_size:
+        _cache.clear()
+    _cache[raw] = (value, seconds)
+    return value, seconds
+
+def _offset(zone):
+    if not zone or zone == 'Z':
+        return 0
+    sign = -1 if zone[0] == '-' else 1
+    zone = zone[1:].replace(':', '')
+    return sign * (int(zone[:2]) * 3600 + int(zone[2:]) * 60)
+
+def _zone(offset):
+    zone = _zones.get(offset)
+    if zone is None:
+        zone = _zones[offset] = tzoffset(None, offset)
+    return zone
@@ -99,9 +99,11 @@ class uiCreator(object):
     def __init__(self, *args, **kwargs):
         super(uiCreator, self).__init__()
 
-    def create_liststore(self, combobox, items, selected_index = 0, has_empty = True, empty_label = "Select One"):
+    def create_liststore(self, combobox, items, selected_index = 0, has_empty = True, empty_label = "Select One",
+                         order = None):
         '''
             Create a liststore filled with items, connect it to a combobox and activate the first index
+            order - keys of items in the order of the rows, the order of items when None
         '''
         liststore = combobox.get_model()
         if not liststore:
@@ -116,8 +118,8 @@ class uiCreator(object):
 
         if has_empty:
             liststore.append([str(empty_label), None])
-        for p in items:
-            liststore.append([items[p], p]) #value, key
+        for p in (order if order is not None else items):
+            liststore.append(["%s" % items[p], p]) #value, key. items can be labels or models like Project and Task
 
         combobox.set_model(liststore)
         combobox.set_active(selected_index)
@@ -0,0 +1,204 @@
+'''
+local stand-in for the parts of the harvest api the client uses, to try things without an account
+
+>>> import HarvestStandIn
+>>> server = HarvestStandIn.HarvestStandIn(projects=400)
+>>> server.start()
+>>> harvest = Harvest.Harvest(server.uri, "EMAIL", "PASSWORD")
+>>> harvest.get_today()
+>>> server.stats()
+{'requests': 1, 'bytes_sent': 123456}
+>>> server.stop()
+'''
+
+import json
+import BaseHTTPServer
+import SocketServer
+from datetime import datetime, date
+from threading import Thread, Lock
+from urlparse import urlparse, parse_qs
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' #keep-alive, like harvest
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._answer(200, '')
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def do_DELETE(self):
+        self._route('DELETE')
+
+    def _route(self, type):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        length = int(self.headers.get('Content-Length') or 0)
+        form = dict((key, values[-1]) for key, values in parse_qs(self.rfile.read(length)).items())
+        code, body = self.server.standin.answer(type, parts, query, form)
+        self._answer(code, json.dumps(body) if body is not None else '')
+
+    def _answer(self, code, body):
+        self.server.standin.sent(len(body)) #counted before the client can see the answer
+        self.send_response(code) #sends Date as well, the client reads harvest's clock from it
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class HarvestStandIn(object):
+    '''
+    keeps one user's entries in memory, any email and password are accepted
+    '''
+    user_id = 1
+
+    def __init__(self, projects = 100, tasks = 10, port = 0):
+        '''
+        projects, tasks - size of the catalog sent with every daily document
+        port - 0 picks a free one
+        '''
+        self.port = port
+        self.catalog = [{
+            'id': p, 'name': 'Project %s' % p, 'client': 'Client %s' % (p / 10), 'code': 'P%s' % p,
+            'billable': True, 'tasks': [{'id': t, 'name': 'Task %s' % t, 'billable': True} for t in range(1, tasks + 1)],
+        } for p in range(1, projects + 1)]
+        self.entries = {} #id -> entry
+        self.next_id = 1
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = Lock()
+        self._server = None
+
+    @property
+    def uri(self):
+        return "http://127.0.0.1:%s" % self._server.server_address[1]
+
+    def start(self):
+        self._server = _Server(('127.0.0.1', self.port), _Handler)
+        self._server.standin = self
+        thread = Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'bytes_sent': self.bytes_sent}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+
+    def sent(self, size):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def add(self, project_id, task_id, notes = "", hours = 0.0, spent_at = None):
+        '''
+        an entry made from somewhere else, eg. the web app
+        '''
+        with self._lock:
+            return self._add(project_id, task_id, notes, hours, spent_at)
+
+    def answer(self, type, parts, query, form):
+        '''
+        (status code, json body or None) for a request, parts is the path split on /
+        '''
+        with self._lock:
+            if parts == ['account', 'who_am_i']:
+                return 200, {'user': {'id': self.user_id, 'email': 'user@example.com'}}
+
+            if len(parts) == 3 and parts[0] == 'people' and parts[2] == 'entries':
+                return 200, self._entries(query)
+
+            if parts[0] != 'daily':
+                return 404, None
+
+            if len(parts) == 1 or (len(parts) == 3 and parts[1].isdigit()):
+                day = date.today()
+                if len(parts) == 3:
+                    day = datetime.strptime("%s %s" % (parts[2], parts[1]), "%Y %j").date()
+                return 200, self._daily(day.isoformat(), query.get('slim'))
+
+            action, entry_id = parts[1], parts[2] if len(parts) > 2 else None
+            if action == 'add' and type == 'POST':
+                return 201, self._entry(self._add(form.get('project_id'), form.get('task_id'), form.get('notes', ""),
+                                                  float(form.get('hours') or 0), form.get('spent_at')))
+            entry = self.entries.get(int(entry_id)) if entry_id and entry_id.isdigit() else None
+            if not entry:
+                return 404, None
+            if action == 'show':
+                return 200, self._entry(entry)
+            if action == 'delete' and type == 'DELETE':
+                del self.entries[entry['id']]
+                return 200, None
+            if action == 'update' and type == 'POST':
+                for key in ('notes', 'project_id', 'task_id'):
+                    if key in form:
+                        entry[key] = form[key]
+                if 'hours' in form:
+                    entry['hours'] = float(form['hours'])
+                entry['updated_at'] = self._now()
+                return 200, self._entry(entry)
+            if action == 'timer':
+                entry['timer_started_at'] = None if entry.get('timer_started_at') else self._now()
+                entry['updated_at'] = self._now()
+                return 200, self._entry(entry)
+            return 404, None
+
+    def _add(self, project_id, task_id, notes, hours, spent_at):
+        entry = {
+            'id': self.next_id, 'project_id': str(project_id), 'task_id': str(task_id), 'notes': notes,
+            'hours': hours, 'spent_at': spent_at or date.today().isoformat(), 'user_id': self.user_id,
+            'created_at': self._now(), 'updated_at': self._now(), 'timer_started_at': None,
+        }
+        self.entries[entry['id']] = entry
+        self.next_id += 1
+        return entry
+
+    def _entry(self, entry):
+        '''
+        an entry as /daily sends it, with the names of its project and task
+        '''
+        entry = dict(entry)
+        for project in self.catalog:
+            if str(project['id']) == str(entry['project_id']):
+                entry['project'] = project['name']
+                entry['client'] = project['client']
+                entry['task'] = dict((str(task['id']), task['name']) for task in project['tasks']).get(
+                    str(entry['task_id']))
+        return entry
+
+    def _daily(self, day, slim):
+        data = {
+            'for_day': day,
+            'day_entries': [self._entry(entry) for entry in sorted(self.entries.values()) if entry['spent_at'] == day],
+        }
+        if not slim:
+            data['projects'] = self.catalog
+        return data
+
+    def _entries(self, query):
+        start = datetime.strptime(query['from'], "%Y%m%d").date().isoformat()
+        end = datetime.strptime(query['to'], "%Y%m%d").date().isoformat()
+        since = query.get('updated_since', '').replace(' ', 'T')[:16]
+        return [{'day_entry': entry} for id, entry in sorted(self.entries.items())
+                if start <= entry['spent_at'] <= end and entry['updated_at'][:16] >= since]
+
+    def _now(self):
+        return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
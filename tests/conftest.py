@@ -0,0 +1,23 @@
+import os, sys
+tests_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert( 0, '%s/../libs' % (tests_path) )
+sys.path.insert( 1, tests_path )
+
+import pytest
+
+from Harvest import Harvest
+from HarvestStandIn import HarvestStandIn
+
+@pytest.fixture
+def server():
+    server = HarvestStandIn(projects=20)
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def harvest(server, tmpdir):
+    harvest = Harvest(server.uri, "user@example.com", "password", outbox=str(tmpdir.join("outbox.journal")),
+                      fresh_for=0)
+    yield harvest
+    harvest.close()
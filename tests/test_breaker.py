@@ -0,0 +1,93 @@
+from time import time
+
+import pytest
+
+from Harvest import AsyncHarvest, HarvestCircuitBreaker, HarvestRateLimiter, HarvestError, HarvestTimeout
+
+def test_trips_after_threshold_failures():
+    trips = []
+    breaker = HarvestCircuitBreaker(threshold=3, timeout=60, on_trip=lambda: trips.append(1))
+    for n in range(2):
+        breaker.failure()
+    assert breaker.state == breaker.CLOSED
+    breaker.failure()
+    assert breaker.state == breaker.OPEN
+    assert len(trips) == 1
+    assert not breaker.allow()
+    assert breaker.short_circuited == 1
+
+def test_success_resets_the_count():
+    breaker = HarvestCircuitBreaker(threshold=3)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == breaker.CLOSED
+
+def test_one_probe_once_the_timeout_passed():
+    breaker = HarvestCircuitBreaker(threshold=1, timeout=0)
+    breaker.failure()
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow() #the probe is still out
+
+def test_failed_probe_doubles_the_wait():
+    breaker = HarvestCircuitBreaker(threshold=1, timeout=10, max_timeout=15)
+    breaker.failure()
+    breaker._open_until = 0
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker._current_timeout == 15
+    assert not breaker.allow()
+
+def test_successful_probe_closes():
+    breaker = HarvestCircuitBreaker(threshold=1, timeout=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow()
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = HarvestCircuitBreaker(threshold=1, timeout=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == breaker.OPEN
+    assert breaker.allow()
+
+def test_probe_answered_with_a_client_error_closes(server):
+    client = AsyncHarvest(server.uri, "user@example.com", "password", fresh_for=0)
+    try:
+        client.breaker.state = client.breaker.OPEN #as if harvest had been down, the timeout is over
+        with pytest.raises(HarvestError):
+            client.get_entry(999).result(10) #harvest answered, a 404 is not an outage
+        assert client.breaker.state == client.breaker.CLOSED
+    finally:
+        client.close()
+
+def test_throttle_longer_than_the_deadline_times_out_right_away(server):
+    limiter = HarvestRateLimiter()
+    client = AsyncHarvest(server.uri, "user@example.com", "password", limiter=limiter, timeouts={'show': 2})
+    client.default_retry_after = 60
+    server.answer = lambda type, parts, query, form: (429, None)
+    try:
+        started = time()
+        with pytest.raises(HarvestTimeout):
+            client.get_entry(1).result(10)
+        assert time() - started < 2 #not held until the deadline, let alone the Retry-After
+        assert limiter.stats()['timed_out'] == 1
+        assert client.breaker.state == client.breaker.CLOSED #harvest answered, it is only busy
+    finally:
+        client.close()
+
+def test_limiter_waits_within_the_deadline():
+    limiter = HarvestRateLimiter()
+    limiter.retry_after(0.2)
+    started = time()
+    limiter.acquire(deadline=time() + 5)
+    assert 0.15 < time() - started < 1
+    limiter.retry_after(30)
+    with pytest.raises(HarvestTimeout):
+        limiter.acquire(deadline=time() + 5)
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+import Decoder
+
+daily = {
+    'for_day': '2013-01-15',
+    'day_entries': [{'id': 1, 'notes': 'a', 'hours': 0.5}],
+    'projects': [{'id': 1, 'name': 'Project 1', 'client': 'Client', 'code': 'P1',
+                  'tasks': [{'id': 7, 'name': 'Task 7', 'billable': True}]}],
+    'meta': {'nested': {'deeper': [1, 2]}},
+}
+catalog = [{'id': 1, 'name': 'Project 1', 'client': 'Client', 'tasks': [{'id': 7, 'name': 'Task 7'}]}]
+
+@pytest.mark.parametrize('raw', [
+    json.dumps(daily),
+    json.dumps(daily, indent=2), #whitespace before every }
+    json.dumps(daily, separators=(',', ':')),
+    " \n%s\n " % json.dumps(daily, indent=4),
+])
+def test_daily_whatever_the_layout(raw):
+    decoded = Decoder.decode_daily(raw)
+    assert decoded['projects'] == catalog
+    assert dict(decoded, projects=daily['projects']) == daily
+
+@pytest.mark.parametrize('raw', ['{}', '{ }', '{\n}'])
+def test_empty_daily(raw):
+    assert Decoder.decode_daily(raw) == {}
+
+def test_daily_with_projects_last_and_spaced():
+    raw = '{"for_day": "2013-01-15" , "projects" : [ {"id": 1, "tasks": []} ]\n}'
+    assert Decoder.decode_daily(raw) == {'for_day': '2013-01-15', 'projects': [{'id': 1, 'tasks': []}]}
+
+def test_broken_daily():
+    with pytest.raises(Decoder.DecodeError):
+        Decoder.decode_daily('{"for_day": "2013-01-15" "projects": []}')
+
+@pytest.mark.parametrize('raw', ['{"a": {"b": 1 } , "c": 2}', '{"a": {"b": {}}, "c": 2}', '{"a": { }, "c": 2}'])
+def test_objects_walked_inside_objects(raw):
+    walk = lambda raw, idx: Decoder._object(raw, idx, {'a': walk})
+    assert Decoder._object(raw, 0, {'a': walk}) == (json.loads(raw), len(raw))
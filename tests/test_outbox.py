@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+
+import Journal
+from Harvest import Harvest
+from Timer import Timer
+
+def open_harvest(server, path):
+    return Harvest(server.uri, "user@example.com", "password", outbox=path, fresh_for=0)
+
+def add(seq, notes, spent_at = None):
+    data = {'project_id': 1, 'task_id': 1, 'notes': notes, 'hours': "0.5"}
+    if spent_at:
+        data['spent_at'] = spent_at
+    return {'seq': seq, 'op': 'add', 'data': data, 'local_id': None, 'queued_at': "2013-01-15T10:00:00Z"}
+
+def test_replays_what_was_left_in_the_journal(server, tmpdir):
+    path = str(tmpdir.join("outbox.journal"))
+    Journal.append(path, add(1, "left from last time"))
+    harvest = open_harvest(server, path)
+    try:
+        assert harvest.outbox.flush(10) == 0
+        assert [e['notes'] for e in server.entries.values()] == ["left from last time"]
+        assert list(Journal.read(path)) == [] #everything acked, the journal starts over
+    finally:
+        harvest.close()
+
+def test_add_that_made_it_before_a_crash_is_not_sent_again(server, tmpdir):
+    path = str(tmpdir.join("outbox.journal"))
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    server.add(1, 1, "sent before the crash", 0.5, yesterday)
+    Journal.append(path, add(1, "sent before the crash", yesterday))
+    Journal.append(path, {'sent': 1})
+    harvest = open_harvest(server, path)
+    try:
+        assert harvest.outbox.flush(10) == 0
+        assert len(server.entries) == 1
+        assert harvest.outbox.harvest_id("queued-1") == "1"
+    finally:
+        harvest.close()
+
+def test_acked_ops_are_not_replayed(server, tmpdir):
+    path = str(tmpdir.join("outbox.journal"))
+    Journal.append(path, add(1, "already posted"))
+    Journal.append(path, {'sent': 1})
+    Journal.append(path, {'ack': 1, 'id': "7"})
+    harvest = open_harvest(server, path)
+    try:
+        assert harvest.outbox.flush(10) == 0
+        assert server.stats()['requests'] == 0
+    finally:
+        harvest.close()
+
+def test_updates_of_an_entry_go_out_as_one(server, harvest):
+    entry = server.add(1, 1, "first", 0.5)
+    for notes in ("second", "third", "fourth"):
+        harvest.outbox.update(entry['id'], {'notes': notes})
+    assert harvest.outbox.flush(10) == 0
+    assert server.entries[entry['id']]['notes'] == "fourth"
+    assert harvest.outbox.stats()['posted'] == 1
+    assert harvest.outbox.stats()['collapsed'] == 2
+
+def test_timer_writes_not_queued_before_a_crash_are_queued_on_start(server, tmpdir):
+    timer_path = str(tmpdir.join("timer.journal"))
+    outbox_path = str(tmpdir.join("outbox.journal"))
+    entry = server.add(1, 1, "running", 0.5)
+    timer = Timer(timer_path) #no outbox, as if it crashed right after the journal write
+    timer.start(str(entry['id']), "1", "1")
+    timer.stop(write={'op': 'update', 'entry_id': str(entry['id']), 'data': {'hours': "1.5"}})
+
+    harvest = open_harvest(server, outbox_path)
+    try:
+        send = lambda write, cause: harvest.outbox.queue(write, cause)['seq']
+        timer = Timer(timer_path, send=send)
+        assert timer.stats()['unqueued'] == 0
+        Timer(timer_path, send=send) #started again before it was posted, queued once all the same
+        assert harvest.outbox.flush(10) == 0
+        assert server.entries[entry['id']]['hours'] == 1.5
+        assert harvest.outbox.stats()['queued'] == 1
+    finally:
+        harvest.close()
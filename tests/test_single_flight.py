@@ -0,0 +1,46 @@
+from threading import Thread
+from time import time
+
+import pytest
+
+from Harvest import AsyncHarvest, HarvestFuture, HarvestError
+
+def in_thread(fn):
+    '''
+    run fn on its own thread, returns whether it finished, a deadlock never does
+    '''
+    thread = Thread(target=fn)
+    thread.daemon = True
+    thread.start()
+    thread.join(5)
+    return not thread.is_alive()
+
+@pytest.fixture
+def client(server):
+    client = AsyncHarvest(server.uri, "user@example.com", "password")
+    yield client
+    client.close()
+
+def test_joins_a_request_that_finished_before_it_was_watched(client):
+    def submit(fn, *args, **kwargs):
+        future = HarvestFuture()
+        future.set_result({'day_entry': {'id': 1}}) #the call was over before submit returned
+        return future
+    client.pool.submit = submit
+    answers = []
+    assert in_thread(lambda: answers.extend(client.get_entry(1).result(5) for n in range(3)))
+    assert answers == [{'day_entry': {'id': 1}}] * 3
+
+def test_reads_fail_fast_while_the_breaker_is_open(client):
+    client.breaker.state = client.breaker.OPEN
+    client.breaker._open_until = time() + 60
+    errors = []
+    def read():
+        for entry_id in range(20):
+            try:
+                client.get_entry(entry_id).result(5)
+            except HarvestError as e:
+                errors.append(e)
+    assert in_thread(read)
+    assert len(errors) == 20
+    assert in_thread(client.forget_reads) #writes wait on the same lock
@@ -0,0 +1,43 @@
+from datetime import datetime, date, timedelta
+
+from Store import Store
+
+margin = 120 #seconds the watermark is kept behind harvest's clock
+
+def test_delta_sync(server, harvest):
+    earlier = (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    for e in range(8):
+        server.add(e + 1, 1, "note %s" % e, 0.5)['updated_at'] = earlier #made earlier today
+    store = Store()
+    day = date.today().isoformat()
+    store.sync_day(harvest.get_today(), day, harvest.server_time() - margin)
+    user_id = harvest.who_am_i()['user']['id']
+
+    server.reset_stats()
+    harvest.get_today()
+    full = server.stats()
+
+    server.reset_stats()
+    since = harvest.server_time() - margin
+    store.merge_entries(harvest.get_entries(user_id, day, day, store.watermark(day)), day, since)
+    delta = server.stats()
+    assert delta['requests'] == 1
+    assert delta['bytes_sent'] < full['bytes_sent'] / 10 #no catalog and none of the unchanged entries
+
+    server.add(3, 2, "made on the web", 1.0)
+    store.merge_entries(harvest.get_entries(user_id, day, day, store.watermark(day)), day,
+                        harvest.server_time() - margin)
+    entries = store.get_day(day)['day_entries']
+    assert len(entries) == 9
+    assert [e['project'] for e in entries if e['notes'] == "made on the web"] == ['Project 3'] #named from the catalog
+
+def test_delta_leaves_other_days_alone(server, harvest):
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    server.add(1, 1, "yesterday", 1.0, yesterday)
+    store = Store()
+    day = date.today().isoformat()
+    store.sync_day(harvest.get_today(), day, harvest.server_time() - margin)
+    user_id = harvest.who_am_i()['user']['id']
+    store.merge_entries(harvest.get_entries(user_id, day, day, store.watermark(day)), day)
+    assert store.get_day(day)['day_entries'] == []
+    assert store.synced_days().keys() == [day]
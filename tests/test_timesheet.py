@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+from Store import Store
+from Timesheet import Timesheet
+
+def week_so_far(server):
+    today = date.today()
+    for offset in range(today.weekday() + 1):
+        server.add(offset % 5 + 1, 1, "day %s" % offset, 1.5, (today - timedelta(days=offset)).isoformat())
+    return today.weekday() + 1
+
+def test_cold_open_asks_for_every_day_so_far(server, harvest):
+    days = week_so_far(server)
+    timesheet = Timesheet(harvest, Store())
+    server.reset_stats()
+    week = timesheet.refresh().result(30)
+    assert server.stats()['requests'] == days #days to come are never asked for
+    assert [d for d, data in week if data] == timesheet.days()[:days]
+
+def test_warm_open_only_asks_for_today(server, harvest):
+    week_so_far(server)
+    timesheet = Timesheet(harvest, Store())
+    timesheet.refresh().result(30)
+    server.reset_stats()
+    week = timesheet.refresh().result(30)
+    assert server.stats()['requests'] == 1
+    rows = timesheet.rows(week)
+    assert sum(total for project, task, hours, total in rows) == 1.5 * (date.today().weekday() + 1)
+
+def test_forced_refresh_asks_for_every_day_again(server, harvest):
+    days = week_so_far(server)
+    timesheet = Timesheet(harvest, Store())
+    timesheet.refresh().result(30)
+    server.reset_stats()
+    timesheet.refresh(force=True).result(30)
+    assert server.stats()['requests'] == days
+
+def test_past_days_are_asked_again_once_their_ttl_passed(server, harvest):
+    days = week_so_far(server)
+    timesheet = Timesheet(harvest, Store(), past_ttl=-1)
+    timesheet.refresh().result(30)
+    server.reset_stats()
+    timesheet.refresh().result(30)
+    assert server.stats()['requests'] == days